@@ -0,0 +1,110 @@
+import os
+from dataclasses import dataclass
+from typing import List, Tuple
+
+# Segments are slowed down at most this much; any time still missing is
+# filled by holding the segment's last frame.
+ALIGN_MAX_SLOWDOWN = float(os.getenv("ALIGN_MAX_SLOWDOWN", "2.0"))
+# Source spans shorter than this are folded into their neighbour instead of
+# becoming a segment of their own.
+ALIGN_MIN_SEGMENT_SECONDS = float(os.getenv("ALIGN_MIN_SEGMENT_SECONDS", "0.05"))
+# Neighbouring segments that both play within this much of real time are merged.
+ALIGN_SPEED_TOLERANCE = float(os.getenv("ALIGN_SPEED_TOLERANCE", "0.01"))
+
+# (time in the source video the line describes, time the line starts in the
+# narration track, length of the line in seconds)
+Cue = Tuple[float, float, float]
+
+
+@dataclass
+class Segment:
+    """Source span `[source_start, source_end)` played over `duration` seconds of output."""
+    source_start: float
+    source_end: float
+    duration: float
+    max_slowdown: float = ALIGN_MAX_SLOWDOWN
+
+    @property
+    def source_duration(self) -> float:
+        return self.source_end - self.source_start
+
+    @property
+    def stretched_duration(self) -> float:
+        return min(self.duration, self.source_duration * self.max_slowdown)
+
+    @property
+    def speed(self) -> float:
+        return self.source_duration / self.stretched_duration
+
+    @property
+    def pad(self) -> float:
+        return self.duration - self.stretched_duration
+
+
+def build_time_map(cues: List[Cue], video_duration: float, max_slowdown: float = ALIGN_MAX_SLOWDOWN) -> List[Segment]:
+    """
+    Piecewise map from the source video onto the narration track. The span
+    between two cues is retimed so the frame each line describes is on screen
+    when the line starts; the tail after the last cue plays at normal speed,
+    or is stretched if the last line runs past the end of the video.
+    """
+    cues = sorted(
+        (min(max(source, 0.0), video_duration), start, length) for source, start, length in cues
+    )
+    points = [(0.0, 0.0)] + [(source, start) for source, start, _ in cues]
+    if cues:
+        last_source, last_start, last_length = cues[-1]
+        tail = max(video_duration - last_source, last_length)
+        points.append((video_duration, last_start + tail))
+    else:
+        points.append((video_duration, video_duration))
+
+    segments: List[Segment] = []
+    carried = 0.0
+    for (source_start, out_start), (source_end, out_end) in zip(points, points[1:]):
+        out_duration = max(0.0, out_end - out_start)
+        if source_end - source_start < ALIGN_MIN_SEGMENT_SECONDS:
+            # Nothing to show for this span, so hold the neighbouring frames instead.
+            if segments:
+                segments[-1].duration += out_duration
+                segments[-1].source_end = source_end
+            else:
+                carried += out_duration
+            continue
+        segment = Segment(source_start, source_end, out_duration + carried, max_slowdown)
+        carried = 0.0
+        previous = segments[-1] if segments else None
+        if (
+            previous is not None
+            and previous.pad == 0
+            and abs(previous.speed - 1.0) <= ALIGN_SPEED_TOLERANCE
+            and abs(segment.speed - 1.0) <= ALIGN_SPEED_TOLERANCE
+        ):
+            previous.source_end = segment.source_end
+            previous.duration += segment.duration
+            continue
+        segments.append(segment)
+    if carried and segments:
+        segments[-1].duration += carried
+    return segments
+
+
+def segment_inputs(video_path: str, segments: List[Segment]) -> List[str]:
+    """One seeked input per segment, so ffmpeg decodes each span once and never buffers the others."""
+    args = []
+    for segment in segments:
+        args += ["-ss", f"{segment.source_start:.6f}", "-t", f"{segment.source_duration:.6f}", "-i", video_path]
+    return args
+
+
+def segment_filter(segments: List[Segment]) -> str:
+    """Filter graph retiming input `i` by segment `i` and concatenating the results into `[v]`."""
+    chains = []
+    for i, segment in enumerate(segments):
+        chain = f"[{i}:v]setpts=(PTS-STARTPTS)/{segment.speed:.6f}"
+        if segment.pad > 1e-3:
+            chain += f",tpad=stop_mode=clone:stop_duration={segment.pad:.6f}"
+        chains.append(f"{chain}[v{i}]")
+    labels = "".join(f"[v{i}]" for i in range(len(segments)))
+    chains.append(f"{labels}concat=n={len(segments)}:v=1:a=0[v]")
+    return ";".join(chains)
@@ -0,0 +1,43 @@
+from typing import List, Tuple
+
+import numpy as np
+
+
+class AudioTimeline:
+    """
+    Lays 16-bit PCM clips out on a single timeline. Each clip starts at its
+    timestamp, or right after the previous clip if that one is still playing.
+    Clips are only referenced until `render`, which allocates the whole track
+    once and copies every clip into place, leaving the gaps silent.
+    """
+
+    def __init__(self, sample_rate: int, channels: int = 1):
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self._clips: List[Tuple[int, np.ndarray]] = []
+        self._end = 0
+
+    def add(self, timestamp: float, pcm: bytes) -> float:
+        """Place a clip and return the time, in seconds, it starts playing."""
+        frame_bytes = 2 * self.channels
+        if len(pcm) % frame_bytes:
+            raise ValueError(f"PCM data length ({len(pcm)} bytes) is not a multiple of the frame size ({frame_bytes} bytes)")
+        samples = np.frombuffer(pcm, dtype=np.int16).reshape(-1, self.channels)
+        start = max(round(timestamp * self.sample_rate), self._end)
+        self._clips.append((start, samples))
+        self._end = start + len(samples)
+        return start / self.sample_rate
+
+    @property
+    def duration(self) -> float:
+        return self._end / self.sample_rate
+
+    def render(self) -> np.ndarray:
+        """The finished track as an int16 array of shape (frames, channels)."""
+        track = np.zeros((self._end, self.channels), dtype=np.int16)
+        for start, samples in self._clips:
+            track[start:start + len(samples)] = samples
+        return track
+
+    def to_bytes(self) -> bytes:
+        return self.render().tobytes()
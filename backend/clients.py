@@ -0,0 +1,97 @@
+import os
+from typing import Optional
+
+import httpx
+from anthropic import AsyncAnthropic
+from elevenlabs.client import AsyncElevenLabs
+from openai import AsyncOpenAI
+
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "100"))
+HTTP_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("HTTP_MAX_KEEPALIVE_CONNECTIONS", "20"))
+HTTP_KEEPALIVE_EXPIRY_SECONDS = float(os.getenv("HTTP_KEEPALIVE_EXPIRY_SECONDS", "60"))
+HTTP_CONNECT_TIMEOUT_SECONDS = float(os.getenv("HTTP_CONNECT_TIMEOUT_SECONDS", "10"))
+HTTP_TIMEOUT_SECONDS = float(os.getenv("HTTP_TIMEOUT_SECONDS", "120"))
+LLM_TIMEOUT_SECONDS = float(os.getenv("LLM_TIMEOUT_SECONDS", "300"))
+
+
+def _http_client(timeout: float) -> httpx.AsyncClient:
+    return httpx.AsyncClient(
+        limits=httpx.Limits(
+            max_connections=HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=HTTP_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=HTTP_KEEPALIVE_EXPIRY_SECONDS,
+        ),
+        timeout=httpx.Timeout(timeout, connect=HTTP_CONNECT_TIMEOUT_SECONDS),
+    )
+
+
+class ClientRegistry:
+    """
+    Application-lifetime API clients. Each service gets its own keep-alive
+    connection pool, so requests reuse warm TLS connections instead of
+    building a new client per call. Clients are created on first use; `start`
+    creates them up front and `close` releases the pools on shutdown.
+
+    Supabase storage is reached through `http` (see storage.SupabaseStorage)
+    rather than supabase-py, whose sync client opens connections of its own
+    that this registry could neither share nor close.
+    """
+
+    def __init__(self):
+        self._http: Optional[httpx.AsyncClient] = None
+        self._anthropic: Optional[AsyncAnthropic] = None
+        self._openai: Optional[AsyncOpenAI] = None
+        self._elevenlabs: Optional[AsyncElevenLabs] = None
+        self._pools: list = []
+
+    def _pool(self, timeout: float) -> httpx.AsyncClient:
+        client = _http_client(timeout)
+        self._pools.append(client)
+        return client
+
+    @property
+    def http(self) -> httpx.AsyncClient:
+        """Plain HTTP client for Kodisc, CDNs and the Supabase storage REST API."""
+        if self._http is None:
+            self._http = self._pool(HTTP_TIMEOUT_SECONDS)
+        return self._http
+
+    @property
+    def anthropic(self) -> AsyncAnthropic:
+        if self._anthropic is None:
+            self._anthropic = AsyncAnthropic(
+                api_key=os.getenv("ANTHROPIC_API_KEY"),
+                http_client=self._pool(LLM_TIMEOUT_SECONDS),
+            )
+        return self._anthropic
+
+    @property
+    def openai(self) -> AsyncOpenAI:
+        if self._openai is None:
+            self._openai = AsyncOpenAI(
+                api_key=os.getenv("OPENAI_API_KEY"),
+                http_client=self._pool(LLM_TIMEOUT_SECONDS),
+            )
+        return self._openai
+
+    @property
+    def elevenlabs(self) -> AsyncElevenLabs:
+        if self._elevenlabs is None:
+            self._elevenlabs = AsyncElevenLabs(
+                api_key=os.getenv("ELEVENLABS_API_KEY"),
+                httpx_client=self._pool(HTTP_TIMEOUT_SECONDS),
+            )
+        return self._elevenlabs
+
+    def start(self):
+        for name in ("http", "anthropic", "openai", "elevenlabs"):
+            try:
+                getattr(self, name)
+            except Exception as e:
+                print(f"Could not create {name} client at startup: {e}")
+
+    async def close(self):
+        pools, self._pools = self._pools, []
+        for pool in pools:
+            await pool.aclose()
+        self._http = self._anthropic = self._openai = self._elevenlabs = None
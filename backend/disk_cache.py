@@ -0,0 +1,171 @@
+import os
+import shutil
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, Optional, Tuple
+
+
+def _entry_size(path: str) -> int:
+    if os.path.isfile(path):
+        return os.path.getsize(path)
+    total = 0
+    for dirpath, _, filenames in os.walk(path):
+        for filename in filenames:
+            try:
+                total += os.path.getsize(os.path.join(dirpath, filename))
+            except OSError:
+                pass
+    return total
+
+
+def _remove(path: str):
+    if os.path.isdir(path):
+        shutil.rmtree(path, ignore_errors=True)
+    else:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+class DiskLRUCache:
+    """
+    Size-bounded on-disk key/value store.
+
+    Every entry is a file or directory named after its key under `root`. The
+    entry's mtime doubles as its last-access time, so the LRU order survives
+    restarts. Entries are written to a temporary name first and renamed into
+    place, so readers never see a half-written entry.
+
+    The directory is scanned once on startup; after that the access times and
+    sizes of the entries, and their running total, are tracked in memory.
+    """
+
+    def __init__(self, root: str, max_bytes: int):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        # key -> (last access time, size in bytes)
+        self._entries: Dict[str, Tuple[float, int]] = {}
+        self._bytes = 0
+        self._pins: Dict[str, int] = {}
+        os.makedirs(root, exist_ok=True)
+        self._scan()
+
+    def _scan(self):
+        for name in os.listdir(self.root):
+            path = os.path.join(self.root, name)
+            if name.startswith(".tmp-"):
+                _remove(path)
+                continue
+            try:
+                mtime = os.stat(path).st_mtime
+            except OSError:
+                continue
+            self._track(name, mtime, _entry_size(path))
+
+    def _track(self, key: str, atime: float, size: int):
+        self._untrack(key)
+        self._entries[key] = (atime, size)
+        self._bytes += size
+
+    def _untrack(self, key: str):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry[1]
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.root, key)
+
+    def get(self, key: str) -> Optional[str]:
+        path = self.path(key)
+        with self._lock:
+            if not os.path.exists(path):
+                self._untrack(key)
+                self.misses += 1
+                return None
+            self.hits += 1
+            entry = self._entries.get(key)
+            # Entries written by another process sharing the directory are adopted here.
+            self._track(key, time.time(), entry[1] if entry is not None else _entry_size(path))
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return path
+
+    def put(self, key: str, writer: Callable[[str], None]) -> str:
+        """Call `writer(tmp_path)` to produce the entry, then publish it as `key`."""
+        path = self.path(key)
+        tmp_path = os.path.join(self.root, f".tmp-{uuid.uuid4().hex}")
+        try:
+            writer(tmp_path)
+            size = _entry_size(tmp_path)
+            with self._lock:
+                if os.path.exists(path):
+                    _remove(path)
+                os.replace(tmp_path, path)
+                self._track(key, time.time(), size)
+        finally:
+            _remove(tmp_path)
+        self.evict(keep=key)
+        return path
+
+    def discard(self, key: str):
+        with self._lock:
+            self._untrack(key)
+            _remove(self.path(key))
+
+    def reject(self, key: str):
+        """Discard an entry `get` just returned that turned out unreadable; the lookup counts as a miss."""
+        with self._lock:
+            self.hits -= 1
+            self.misses += 1
+            self._untrack(key)
+            _remove(self.path(key))
+
+    @contextmanager
+    def pinned(self, *keys: str) -> Iterator[None]:
+        """Keep `keys` from being evicted while the block runs, including entries published during it."""
+        with self._lock:
+            for key in keys:
+                self._pins[key] = self._pins.get(key, 0) + 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                for key in keys:
+                    self._pins[key] -= 1
+                    if not self._pins[key]:
+                        del self._pins[key]
+
+    def evict(self, keep: Optional[str] = None):
+        with self._lock:
+            if self._bytes <= self.max_bytes:
+                return
+            for atime, key in sorted((atime, key) for key, (atime, _) in self._entries.items()):
+                if self._bytes <= self.max_bytes:
+                    break
+                if key == keep or key in self._pins:
+                    continue
+                self._untrack(key)
+                _remove(self.path(key))
+                self.evictions += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+            }
@@ -0,0 +1,57 @@
+import asyncio
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+from typing import Optional
+
+# Blocking I/O and GIL-releasing work (file copies, FAISS, cv2, SDK calls
+# without an async variant) goes to the thread pool. CPU-bound encoding and
+# rendering goes to the process pool so it cannot starve the event loop.
+THREAD_POOL_SIZE = int(os.getenv("THREAD_POOL_SIZE", "16"))
+PROCESS_POOL_SIZE = int(os.getenv("PROCESS_POOL_SIZE", str(max(1, (os.cpu_count() or 2) // 2))))
+# By the time the process pool exists the server already runs several threads
+# (embedding batcher, I/O pool, HTTP pools). Forking it could copy a lock some
+# other thread held into the child, so workers come from a clean forkserver.
+PROCESS_START_METHOD = os.getenv("PROCESS_START_METHOD", "forkserver" if os.name == "posix" else "spawn")
+
+_thread_pool: Optional[ThreadPoolExecutor] = None
+_process_pool: Optional[ProcessPoolExecutor] = None
+
+
+def get_thread_pool() -> ThreadPoolExecutor:
+    global _thread_pool
+    if _thread_pool is None:
+        _thread_pool = ThreadPoolExecutor(max_workers=THREAD_POOL_SIZE, thread_name_prefix="lumina-io")
+    return _thread_pool
+
+
+def get_process_pool() -> ProcessPoolExecutor:
+    global _process_pool
+    if _process_pool is None:
+        _process_pool = ProcessPoolExecutor(
+            max_workers=PROCESS_POOL_SIZE,
+            mp_context=multiprocessing.get_context(PROCESS_START_METHOD),
+        )
+    return _process_pool
+
+
+async def run_in_thread(func, *args, **kwargs):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_thread_pool(), partial(func, *args, **kwargs))
+
+
+async def run_in_process(func, *args, **kwargs):
+    """Run a picklable top-level function in the process pool."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_process_pool(), partial(func, *args, **kwargs))
+
+
+def shutdown_pools():
+    global _thread_pool, _process_pool
+    if _thread_pool is not None:
+        _thread_pool.shutdown(wait=True)
+        _thread_pool = None
+    if _process_pool is not None:
+        _process_pool.shutdown(wait=True)
+        _process_pool = None
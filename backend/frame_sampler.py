@@ -0,0 +1,213 @@
+import base64
+import os
+from typing import Iterator, Optional, Tuple
+
+import cv2
+import numpy as np
+
+FRAME_SAMPLER_STRATEGY = os.getenv("FRAME_SAMPLER_STRATEGY", "auto")
+# Without a GOP estimate, seek once the gap between samples is at least this many frames.
+SEEK_MIN_FRAME_GAP = int(os.getenv("SEEK_MIN_FRAME_GAP", "250"))
+GOP_PROBE_PACKETS = 600
+
+# The narration model only looks at frames in "low" detail (512px), so larger
+# frames are wasted memory and payload.
+NARRATION_FRAME_MAX_SIDE = int(os.getenv("NARRATION_FRAME_MAX_SIDE", "512"))
+NARRATION_JPEG_QUALITY = int(os.getenv("NARRATION_JPEG_QUALITY", "70"))
+
+STRATEGIES = ("auto", "sequential", "seek", "keyframe")
+
+
+def probe_gop_length(video_path: str) -> Optional[float]:
+    """
+    Average distance between keyframes, in frames, from the first packets of
+    the file. Only demuxes, so it costs no decoding. Returns None when PyAV is
+    unavailable or the file cannot be probed.
+    """
+    try:
+        import av
+    except ImportError:
+        return None
+    try:
+        with av.open(video_path) as container:
+            stream = container.streams.video[0]
+            keyframes = []
+            packets = 0
+            for packet in container.demux(stream):
+                if not packet.size:
+                    continue
+                if packet.is_keyframe:
+                    keyframes.append(packets)
+                packets += 1
+                if packets >= GOP_PROBE_PACKETS:
+                    break
+    except Exception:
+        return None
+    if not keyframes:
+        return None
+    if len(keyframes) == 1:
+        return float(packets)
+    return float(np.mean(np.diff(keyframes)))
+
+
+def choose_strategy(video_path: str, frame_gap: int) -> str:
+    """
+    Pick the cheapest way to visit one frame every `frame_gap` frames:
+    keyframe-only decoding when keyframes are at least that dense, seeking
+    when a seek (about half a GOP of decoding) is cheaper than decoding every
+    frame in between, and a sequential grab() scan otherwise.
+    """
+    gop = probe_gop_length(video_path)
+    if gop is None:
+        return "seek" if frame_gap >= SEEK_MIN_FRAME_GAP else "sequential"
+    if gop <= frame_gap:
+        return "keyframe"
+    if gop / 2 < frame_gap:
+        return "seek"
+    return "sequential"
+
+
+def _sequential(video, fps: float, total_frames: int, frame_gap: int):
+    # grab() advances the decoder without converting the frame; only the
+    # frames we keep pay for retrieve().
+    index = 0
+    next_target = 0
+    while index < total_frames - 1:
+        if not video.grab():
+            break
+        if index >= next_target:
+            success, frame = video.retrieve()
+            if not success:
+                break
+            yield index / fps, frame
+            next_target += frame_gap
+        index += 1
+
+
+def _seek(video, fps: float, total_frames: int, frame_gap: int):
+    for target in range(0, max(total_frames - 1, 0), frame_gap):
+        video.set(cv2.CAP_PROP_POS_MSEC, target / fps * 1000.0)
+        success, frame = video.read()
+        if not success:
+            break
+        yield target / fps, frame
+
+
+def _keyframes(video_path: str, seconds_per_frame: float):
+    import av
+
+    with av.open(video_path) as container:
+        stream = container.streams.video[0]
+        stream.codec_context.skip_frame = "NONKEY"
+        next_time = 0.0
+        for frame in container.decode(stream):
+            if frame.time is None or frame.time + 1e-6 < next_time:
+                continue
+            yield float(frame.time), frame.to_ndarray(format="bgr24")
+            next_time = (int(frame.time / seconds_per_frame) + 1) * seconds_per_frame
+
+
+def frame_signature(frame) -> np.ndarray:
+    small = cv2.resize(frame, (64, 36), interpolation=cv2.INTER_AREA)
+    gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+    hist = cv2.calcHist([gray], [0], None, [32], [0, 256])
+    return cv2.normalize(hist, hist).flatten()
+
+
+def scene_distance(a: np.ndarray, b: np.ndarray) -> float:
+    """0 for identical histograms, 1 for completely different ones."""
+    return float(cv2.compareHist(a, b, cv2.HISTCMP_BHATTACHARYYA))
+
+
+def sample_frames(
+    video_path: str,
+    seconds_per_frame: float = 2,
+    strategy: str = FRAME_SAMPLER_STRATEGY,
+    scene_threshold: Optional[float] = None,
+    scene_check_seconds: float = 0.5,
+    max_gap_seconds: Optional[float] = None,
+) -> Iterator[Tuple[float, np.ndarray]]:
+    """
+    Yield `(timestamp_seconds, bgr_frame)` pairs from `video_path`.
+
+    Without `scene_threshold`, one frame is taken every `seconds_per_frame`.
+    With it, candidates are checked every `scene_check_seconds` and a frame is
+    kept only when it differs from the last kept frame by more than the
+    threshold (see `scene_distance`), or when `max_gap_seconds` (default four
+    times `seconds_per_frame`) has passed without one.
+    """
+    if strategy not in STRATEGIES:
+        raise ValueError(f"Unknown frame sampling strategy '{strategy}', expected one of {STRATEGIES}")
+
+    step_seconds = seconds_per_frame if scene_threshold is None else min(scene_check_seconds, seconds_per_frame)
+
+    video = cv2.VideoCapture(video_path)
+    try:
+        total_frames = int(video.get(cv2.CAP_PROP_FRAME_COUNT))
+        fps = video.get(cv2.CAP_PROP_FPS)
+        if not fps or total_frames <= 0:
+            return
+        frame_gap = max(1, int(fps * step_seconds))
+
+        if strategy == "auto":
+            strategy = choose_strategy(video_path, frame_gap)
+        if strategy == "keyframe":
+            try:
+                import av  # noqa: F401
+            except ImportError:
+                strategy = "seek"
+        print(f"Sampling frames from {video_path} with the '{strategy}' strategy")
+
+        if strategy == "keyframe":
+            video.release()
+            candidates = _keyframes(video_path, step_seconds)
+        elif strategy == "seek":
+            candidates = _seek(video, fps, total_frames, frame_gap)
+        else:
+            candidates = _sequential(video, fps, total_frames, frame_gap)
+
+        if scene_threshold is None:
+            yield from candidates
+            return
+
+        max_gap = max_gap_seconds if max_gap_seconds is not None else 4 * seconds_per_frame
+        last_signature = None
+        last_time = None
+        for timestamp, frame in candidates:
+            signature = frame_signature(frame)
+            if (
+                last_signature is None
+                or scene_distance(last_signature, signature) > scene_threshold
+                or timestamp - last_time >= max_gap
+            ):
+                yield timestamp, frame
+                last_signature = signature
+                last_time = timestamp
+    finally:
+        video.release()
+
+
+def downscale(frame: np.ndarray, max_side: int) -> np.ndarray:
+    height, width = frame.shape[:2]
+    scale = max_side / max(height, width)
+    if scale >= 1:
+        return frame
+    size = (max(1, round(width * scale)), max(1, round(height * scale)))
+    return cv2.resize(frame, size, interpolation=cv2.INTER_AREA)
+
+
+def encode_frames(
+    frames: Iterator[Tuple[float, np.ndarray]],
+    max_side: int = NARRATION_FRAME_MAX_SIDE,
+    jpeg_quality: int = NARRATION_JPEG_QUALITY,
+) -> Iterator[Tuple[float, str]]:
+    """
+    Lazily turn `(timestamp, bgr_frame)` pairs into `(timestamp, base64_jpeg)`.
+    Frames are shrunk before encoding. Nothing is buffered, so the caller
+    decides how many encoded frames are held at once.
+    """
+    for timestamp, frame in frames:
+        success, buffer = cv2.imencode(".jpg", downscale(frame, max_side), [cv2.IMWRITE_JPEG_QUALITY, jpeg_quality])
+        if not success:
+            continue
+        yield timestamp, base64.b64encode(buffer).decode("ascii")
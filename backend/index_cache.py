@@ -0,0 +1,60 @@
+import hashlib
+import json
+import os
+import pickle
+from typing import Iterable, Optional
+
+import faiss
+from langchain_community.vectorstores import FAISS
+from langchain_core.embeddings import Embeddings
+
+from disk_cache import DiskLRUCache
+
+INDEX_CACHE_DIR = os.getenv("INDEX_CACHE_DIR", "index_cache")
+INDEX_CACHE_MAX_MB = int(os.getenv("INDEX_CACHE_MAX_MB", "2048"))
+
+
+def index_cache_key(file_hashes: Iterable[str], chunk_size: int, chunk_overlap: int, embedding_model: str, index_type: str = "flat") -> str:
+    """Content address for an index built from these files with these settings."""
+    payload = json.dumps({
+        "files": sorted(file_hashes),
+        "chunk_size": chunk_size,
+        "chunk_overlap": chunk_overlap,
+        "embedding_model": embedding_model,
+        "index_type": index_type,
+    }, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class IndexCache:
+    """
+    On-disk FAISS index store keyed by `index_cache_key`. Cached indexes are
+    memory-mapped read-only on load, so the vectors stay in the page cache
+    instead of being copied into every request.
+    """
+
+    def __init__(self, root: str = INDEX_CACHE_DIR, max_bytes: int = INDEX_CACHE_MAX_MB * 1024 * 1024):
+        self.store = DiskLRUCache(root, max_bytes)
+
+    def load(self, key: str, embeddings: Embeddings) -> Optional[FAISS]:
+        path = self.store.get(key)
+        if path is None:
+            return None
+        try:
+            index = faiss.read_index(
+                os.path.join(path, "index.faiss"),
+                faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY,
+            )
+            with open(os.path.join(path, "index.pkl"), "rb") as f:
+                docstore, index_to_docstore_id = pickle.load(f)
+        except Exception as e:
+            print(f"Discarding unreadable cached index {key}: {e}")
+            self.store.reject(key)
+            return None
+        return FAISS(embeddings, index, docstore, index_to_docstore_id)
+
+    def save(self, key: str, vectorstore: FAISS):
+        self.store.put(key, vectorstore.save_local)
+
+    def stats(self) -> dict:
+        return self.store.stats()
@@ -0,0 +1,138 @@
+import asyncio
+import os
+from collections import deque
+from typing import AsyncIterator, Callable, List, Optional, Tuple
+
+from langchain_community.vectorstores import FAISS
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_text_splitters import TextSplitter
+
+from executors import PROCESS_POOL_SIZE, run_in_process, run_in_thread
+
+INGEST_PAGES_PER_TASK = int(os.getenv("INGEST_PAGES_PER_TASK", "16"))
+INGEST_EMBED_BATCH_SIZE = int(os.getenv("INGEST_EMBED_BATCH_SIZE", "128"))
+# Parse tasks allowed ahead of the embedder; bounds how much parsed text waits in memory.
+INGEST_MAX_PENDING_TASKS = int(os.getenv("INGEST_MAX_PENDING_TASKS", str(2 * PROCESS_POOL_SIZE)))
+
+Page = Tuple[str, dict]
+
+
+def pdf_page_count(file_path: str) -> int:
+    import pypdf
+
+    return len(pypdf.PdfReader(file_path).pages)
+
+
+def parse_pdf_pages(file_path: str, start: int, stop: int) -> List[Page]:
+    """Text of pages `[start, stop)`. Runs in a worker process."""
+    import pypdf
+
+    reader = pypdf.PdfReader(file_path)
+    total_pages = len(reader.pages)
+    pages = []
+    for page_number in range(start, min(stop, total_pages)):
+        text = reader.pages[page_number].extract_text().strip()
+        pages.append((text, {"source": file_path, "page": page_number, "total_pages": total_pages}))
+    return pages
+
+
+def parse_text_file(file_path: str) -> List[Page]:
+    from langchain_community.document_loaders import TextLoader
+
+    return [(doc.page_content, doc.metadata) for doc in TextLoader(file_path).load()]
+
+
+def parse_docx_file(file_path: str) -> List[Page]:
+    from langchain_community.document_loaders import Docx2txtLoader
+
+    return [(doc.page_content, doc.metadata) for doc in Docx2txtLoader(file_path).load()]
+
+
+async def _parse_tasks(file_path: str, pages_per_task: int):
+    file_name = os.path.basename(file_path)
+    if file_name.endswith('.pdf'):
+        page_count = await run_in_thread(pdf_page_count, file_path)
+        for start in range(0, page_count, pages_per_task):
+            yield parse_pdf_pages, (file_path, start, start + pages_per_task)
+    elif file_name.endswith('.txt'):
+        yield parse_text_file, (file_path,)
+    elif file_name.endswith('.docx'):
+        yield parse_docx_file, (file_path,)
+    else:
+        print(f"unsupported file type: {file_name}")
+
+
+async def iter_documents(
+    file_paths: List[str],
+    pages_per_task: int = INGEST_PAGES_PER_TASK,
+    max_pending: int = INGEST_MAX_PENDING_TASKS,
+) -> AsyncIterator[Document]:
+    """
+    Yield the files' pages in order while later pages are still being
+    parsed. PDFs are split into runs of `pages_per_task` pages parsed in the
+    process pool, with at most `max_pending` runs in flight.
+    """
+    pending = deque()
+    try:
+        for file_path in file_paths:
+            async for func, args in _parse_tasks(file_path, pages_per_task):
+                pending.append(asyncio.ensure_future(run_in_process(func, *args)))
+                if len(pending) >= max(1, max_pending):
+                    for text, metadata in await pending.popleft():
+                        yield Document(page_content=text, metadata=metadata)
+        while pending:
+            for text, metadata in await pending.popleft():
+                yield Document(page_content=text, metadata=metadata)
+    finally:
+        for task in pending:
+            task.cancel()
+
+
+async def build_vectorstore(
+    file_paths: List[str],
+    embeddings: Embeddings,
+    splitter: TextSplitter,
+    batch_size: int = INGEST_EMBED_BATCH_SIZE,
+    vectorstore: Optional[FAISS] = None,
+    chunk_id: Optional[Callable[[Document], str]] = None,
+    metadata: Optional[Callable[[Document], dict]] = None,
+    **parse_options,
+) -> FAISS:
+    """
+    Parse, split and embed `file_paths` as a stream: chunks are embedded in
+    batches of `batch_size` as soon as their pages are parsed, so only one
+    batch of chunks and the parse-ahead window are held besides the index.
+
+    Chunks are added to `vectorstore` when one is given. `chunk_id` picks
+    each chunk's docstore id (random by default), and `metadata` replaces
+    the metadata stored with it.
+    """
+    batch: List[Document] = []
+
+    async def flush():
+        nonlocal vectorstore
+        texts = [chunk.page_content for chunk in batch]
+        metadatas = [metadata(chunk) if metadata is not None else chunk.metadata for chunk in batch]
+        ids = [chunk_id(chunk) for chunk in batch] if chunk_id is not None else None
+        vectors = await run_in_thread(embeddings.embed_documents, texts)
+        if vectorstore is None:
+            vectorstore = await run_in_thread(FAISS.from_embeddings, list(zip(texts, vectors)), embeddings, metadatas, ids)
+        else:
+            await run_in_thread(vectorstore.add_embeddings, list(zip(texts, vectors)), metadatas, ids)
+        batch.clear()
+
+    async for page in iter_documents(file_paths, **parse_options):
+        # Splitting a long page is pure-Python work; keep it off the event loop.
+        batch.extend(await run_in_thread(splitter.split_documents, [page]))
+        while len(batch) >= batch_size:
+            overflow = batch[batch_size:]
+            del batch[batch_size:]
+            await flush()
+            batch.extend(overflow)
+    if batch:
+        await flush()
+
+    if vectorstore is None:
+        raise ValueError("No text could be extracted from the uploaded files")
+    return vectorstore
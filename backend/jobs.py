@@ -0,0 +1,187 @@
+import asyncio
+import os
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "4"))
+JOB_QUEUE_SIZE = int(os.getenv("JOB_QUEUE_SIZE", "32"))
+JOB_TTL_SECONDS = float(os.getenv("JOB_TTL_SECONDS", "3600"))
+
+Reporter = Callable[..., None]
+
+
+class QueueFullError(Exception):
+    pass
+
+
+@dataclass
+class Job:
+    id: str
+    kind: str
+    status: str = "queued"
+    stage: Optional[str] = None
+    result: Optional[Any] = None
+    error: Optional[str] = None
+    events: List[dict] = field(default_factory=list)
+    created_at: float = field(default_factory=time.time)
+    finished_at: Optional[float] = None
+
+    @property
+    def done(self) -> bool:
+        return self.status in ("succeeded", "failed")
+
+    def to_dict(self) -> dict:
+        return {
+            "job_id": self.id,
+            "kind": self.kind,
+            "status": self.status,
+            "stage": self.stage,
+            "result": self.result,
+            "error": self.error,
+            "events": self.events,
+            "created_at": self.created_at,
+            "finished_at": self.finished_at,
+        }
+
+
+class JobManager:
+    """
+    Bounded queue of background jobs drained by a fixed number of workers.
+
+    `submit` never waits: when the queue is full it raises QueueFullError so
+    the endpoint can push back on the client instead of piling up work.
+    """
+
+    def __init__(self, workers: int = JOB_WORKERS, max_queue: int = JOB_QUEUE_SIZE, ttl: float = JOB_TTL_SECONDS):
+        self.workers = workers
+        self.max_queue = max_queue
+        self.ttl = ttl
+        self.jobs: Dict[str, Job] = {}
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+        self._changed: Dict[str, asyncio.Condition] = {}
+
+    async def start(self):
+        if self._queue is not None:
+            return
+        self._queue = asyncio.Queue(maxsize=self.max_queue)
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self):
+        """Cancel the running jobs and fail the queued ones; every job's cleanup runs."""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        while self._queue is not None and not self._queue.empty():
+            job, _, cleanup = self._queue.get_nowait()
+            job.status = "failed"
+            job.error = "cancelled"
+            job.finished_at = time.time()
+            self._emit(job, job.status, result=None, error=job.error)
+            self._cleanup(job, cleanup)
+        self._queue = None
+
+    def submit(
+        self,
+        kind: str,
+        func: Callable[[Reporter], Awaitable[Any]],
+        cleanup: Optional[Callable[[], None]] = None,
+    ) -> Job:
+        """Queue `func(report)` to run on a worker and return its Job right away."""
+        if self._queue is None:
+            raise RuntimeError("JobManager.start() has not been called")
+        self._prune()
+        job = Job(id=uuid.uuid4().hex, kind=kind)
+        try:
+            self._queue.put_nowait((job, func, cleanup))
+        except asyncio.QueueFull:
+            raise QueueFullError(f"Job queue is full ({self.max_queue} pending)")
+        self.jobs[job.id] = job
+        self._changed[job.id] = asyncio.Condition()
+        self._emit(job, "queued")
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        return self.jobs.get(job_id)
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "max_queue": self.max_queue,
+            "running": sum(1 for job in self.jobs.values() if job.status == "running"),
+        }
+
+    async def events(self, job_id: str):
+        """Yield the job's events as they happen, ending once it has finished."""
+        job = self.jobs.get(job_id)
+        if job is None:
+            return
+        changed = self._changed[job_id]
+        sent = 0
+        while True:
+            while sent < len(job.events):
+                yield job.events[sent]
+                sent += 1
+            if job.done:
+                return
+            async with changed:
+                await changed.wait_for(lambda: len(job.events) > sent or job.done)
+
+    async def _worker(self):
+        while True:
+            job, func, cleanup = await self._queue.get()
+            try:
+                await self._run(job, func)
+            finally:
+                self._cleanup(job, cleanup)
+                self._queue.task_done()
+
+    def _cleanup(self, job: Job, cleanup: Optional[Callable[[], None]]):
+        if cleanup is not None:
+            try:
+                cleanup()
+            except Exception as e:
+                print(f"Cleanup for job {job.id} failed: {e}")
+
+    async def _run(self, job: Job, func):
+        job.status = "running"
+        self._emit(job, "running")
+
+        def report(stage: str, **info):
+            job.stage = stage
+            self._emit(job, "stage", stage=stage, **info)
+
+        try:
+            job.result = await func(report)
+            job.status = "succeeded"
+        except asyncio.CancelledError:
+            job.status = "failed"
+            job.error = "cancelled"
+            raise
+        except Exception as e:
+            print(f"Job {job.id} failed: {e}")
+            job.status = "failed"
+            job.error = str(e)
+        finally:
+            job.finished_at = time.time()
+            self._emit(job, job.status, result=job.result, error=job.error)
+
+    def _emit(self, job: Job, event: str, **data):
+        job.events.append({"event": event, "time": time.time(), **data})
+        changed = self._changed.get(job.id)
+        if changed is not None:
+            asyncio.ensure_future(self._notify(changed))
+
+    async def _notify(self, changed: asyncio.Condition):
+        async with changed:
+            changed.notify_all()
+
+    def _prune(self):
+        cutoff = time.time() - self.ttl
+        for job_id in [job_id for job_id, job in self.jobs.items() if job.done and job.finished_at < cutoff]:
+            del self.jobs[job_id]
+            self._changed.pop(job_id, None)
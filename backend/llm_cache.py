@@ -0,0 +1,118 @@
+import hashlib
+import json
+import os
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "1000"))
+LLM_CACHE_TTL_SECONDS = float(os.getenv("LLM_CACHE_TTL_SECONDS", "86400"))
+# Cosine similarity two prompts need, within the same scope, to share a response.
+LLM_CACHE_SIMILARITY = float(os.getenv("LLM_CACHE_SIMILARITY", "0.95"))
+
+
+def llm_cache_key(model: str, *parts: Any) -> str:
+    """Hash of the model and everything that goes into the call."""
+    payload = json.dumps({"model": model, "parts": parts}, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+@dataclass
+class _Entry:
+    value: Any
+    expires_at: float
+    scope: Optional[str] = None
+    embedding: Optional[np.ndarray] = None
+
+
+def _normalize(embedding: Sequence[float]) -> np.ndarray:
+    vector = np.asarray(embedding, dtype=np.float32)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+class LLMCache:
+    """
+    In-memory LRU cache of model responses.
+
+    Lookups first try the exact key from `llm_cache_key`. Failing that, if the
+    caller passes a `scope` (e.g. the document set or video being worked on)
+    and an embedding of the user's prompt, any entry in the same scope whose
+    prompt embedding is at least `similarity` cosine-similar is reused. Entries
+    expire after `ttl` seconds; past `max_entries` the least recently used
+    entry is dropped.
+    """
+
+    def __init__(self, max_entries: int = LLM_CACHE_MAX_ENTRIES, ttl: float = LLM_CACHE_TTL_SECONDS, similarity: float = LLM_CACHE_SIMILARITY):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.similarity = similarity
+        self.exact_hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._scopes: Dict[str, List[str]] = {}
+
+    def get(self, key: str, scope: Optional[str] = None, embedding: Optional[Sequence[float]] = None) -> Optional[Any]:
+        self._expire()
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+            self.exact_hits += 1
+            return entry.value
+
+        if scope is not None and embedding is not None and self._scopes.get(scope):
+            query = _normalize(embedding)
+            keys = self._scopes[scope]
+            vectors = np.stack([self._entries[k].embedding for k in keys])
+            scores = vectors @ query
+            best = int(np.argmax(scores))
+            if scores[best] >= self.similarity:
+                self._entries.move_to_end(keys[best])
+                self.semantic_hits += 1
+                return self._entries[keys[best]].value
+
+        self.misses += 1
+        return None
+
+    def put(self, key: str, value: Any, scope: Optional[str] = None, embedding: Optional[Sequence[float]] = None):
+        self._remove(key)
+        entry = _Entry(value, time.time() + self.ttl)
+        if scope is not None and embedding is not None:
+            entry.scope = scope
+            entry.embedding = _normalize(embedding)
+            self._scopes.setdefault(scope, []).append(key)
+        self._entries[key] = entry
+        while len(self._entries) > self.max_entries:
+            self._remove(next(iter(self._entries)))
+            self.evictions += 1
+
+    def _remove(self, key: str):
+        entry = self._entries.pop(key, None)
+        if entry is None or entry.scope is None:
+            return
+        keys = self._scopes[entry.scope]
+        keys.remove(key)
+        if not keys:
+            del self._scopes[entry.scope]
+
+    def _expire(self):
+        now = time.time()
+        for key in [key for key, entry in self._entries.items() if entry.expires_at <= now]:
+            self._remove(key)
+
+    def stats(self) -> dict:
+        lookups = self.exact_hits + self.semantic_hits + self.misses
+        return {
+            "exact_hits": self.exact_hits,
+            "semantic_hits": self.semantic_hits,
+            "misses": self.misses,
+            "hit_rate": (self.exact_hits + self.semantic_hits) / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+        }
@@ -356,43 +356,59 @@
 #     uvicorn.run(app, host="0.0.0.0", port=8000) 
 from fastapi import FastAPI, UploadFile, File, Form, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
 import os
 import shutil
-from langchain_community.document_loaders import PyPDFLoader, TextLoader, Docx2txtLoader
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 from dotenv import load_dotenv
 from langchain_openai import OpenAIEmbeddings
 from langchain_core.messages import HumanMessage, SystemMessage
 from langchain_community.vectorstores import FAISS
-from langchain_community.embeddings import HuggingFaceEmbeddings
 from langchain.chains import RetrievalQA
 import uvicorn
-from typing import List
+from typing import List, Optional
 import subprocess
 import tempfile
 import uuid
 import re
-from supabase import create_client, Client
-import requests
+import hashlib
+import httpx
 import json
+from collections import deque
 from pydantic import BaseModel
-from openai import OpenAI
 import cv2
 import base64
-from pydub import AudioSegment
 from gradio_client import Client
 from elevenlabs import play
-from elevenlabs.client import ElevenLabs
 from elevenlabs.core import ApiError
-from moviepy.editor import VideoFileClip, AudioFileClip, vfx
+from embedding_service import EmbeddingService
+from index_cache import IndexCache, index_cache_key
+from retrieval import search_with_vectors, rerank
+from executors import run_in_thread, run_in_process, shutdown_pools
+from video_render import RENDER_BACKEND, render_final_video
+from jobs import JobManager, QueueFullError
+from pipeline import Stage, run_stages
+from storage import SupabaseStorage
+from clients import ClientRegistry
+from frame_sampler import sample_frames, encode_frames, FRAME_SAMPLER_STRATEGY
+from narration import frame_digests, narrate_in_windows
+from tts import synthesize_all, TTS_SAMPLE_RATE
+from tts_cache import TTSCache
+from audio_timeline import AudioTimeline
+from manim_render import ManimRenderFarm
+from llm_cache import LLMCache, llm_cache_key
+from result_memo import ResultMemo, generation_cacheable, generation_key
+from ingestion import build_vectorstore
+from vector_index import compact_index, index_config, tune_index
+from space_index import SpaceIndexStore, check_space_id
 
 
 load_dotenv()
 
 SUPABASE_URL = os.getenv("SUPABASE_URL")
 SUPABASE_KEY = os.getenv("SUPABASE_KEY")
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
+clients = ClientRegistry()
+storage = SupabaseStorage(SUPABASE_URL, SUPABASE_KEY, bucket="videos")
 
 app = FastAPI()
 
@@ -404,65 +420,340 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-def upload_file_to_supabase(local_file_path: str, storage_path: str) -> str:
-    with open(local_file_path, "rb") as f:
-        try:
-            res = supabase.storage.from_("videos").upload(storage_path, f)
-        except Exception as upload_error:
-            raise Exception(f"Upload threw exception: {str(upload_error)}")
-
-    if not hasattr(res, "path") or not res.path:
-        raise Exception("Upload succeeded but no path was returned.")
+CHUNK_SIZE = 1000
+CHUNK_OVERLAP = 200
+
+# Kodisc holds the connection open while it renders, so it needs a long read timeout.
+KODISC_TIMEOUT = httpx.Timeout(float(os.getenv("KODISC_TIMEOUT_SECONDS", "600")), connect=10.0)
+# "true"/"false" forces the resumable upload mode on or off; unset picks it by file size.
+STORAGE_RESUMABLE = {"true": True, "false": False}.get(os.getenv("STORAGE_RESUMABLE", "").lower())
+
+embedding_service = EmbeddingService()
+index_cache = IndexCache()
+tts_cache = TTSCache()
+job_manager = JobManager()
+render_farm = ManimRenderFarm()
+llm_cache = LLMCache()
+# Size and recall of the most recent compact index builds.
+index_builds = deque(maxlen=20)
+generation_memo = ResultMemo(cacheable=generation_cacheable)
+space_indexes = SpaceIndexStore(
+    embedding_service,
+    RecursiveCharacterTextSplitter(chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP),
+    embedding_service.model_name,
+)
 
-    return supabase.storage.from_("videos").get_public_url(res.path)
+@app.on_event("startup")
+async def startup():
+    clients.start()
+    embedding_service.start()
+    await job_manager.start()
+
+@app.on_event("shutdown")
+async def shutdown():
+    await job_manager.stop()
+    await render_farm.stop()
+    embedding_service.stop()
+    shutdown_pools()
+    await clients.close()
+
+async def upload_file_to_supabase(local_file_path: str, storage_path: str, content_type: str = "application/octet-stream") -> str:
+    return await storage.upload_file(clients.http, storage_path, local_file_path, content_type=content_type)
+
+async def transfer_to_supabase(source_url: str, storage_path: str) -> str:
+    """Stream a remote file straight into Supabase storage without a local copy."""
+    return await storage.transfer_url(clients.http, source_url, storage_path, resumable=STORAGE_RESUMABLE)
+
+def save_upload(file: UploadFile, file_path: str) -> str:
+    """Copy an upload into the request workspace, hashing it in the same pass."""
+    digest = hashlib.sha256()
+    with open(file_path, "wb") as buffer:
+        for chunk in iter(lambda: file.file.read(1024 * 1024), b""):
+            digest.update(chunk)
+            buffer.write(chunk)
+    return digest.hexdigest()
 
 @app.get("/")
 async def root():
     return {"message": "bruh"}
 
+@app.get("/cache/stats")
+async def cache_stats():
+    return {
+        "index": {**index_cache.stats(), "recent_builds": list(index_builds)},
+        "tts": tts_cache.stats(),
+        "manim": render_farm.cache.stats(),
+        "llm": llm_cache.stats(),
+        "generation": generation_memo.stats(),
+        "spaces": space_indexes.stats(),
+    }
+
+@app.get("/jobs/stats")
+async def job_stats():
+    return job_manager.stats()
+
+@app.get("/render/stats")
+async def render_stats():
+    return render_farm.stats()
+
+def check_generate_inputs(files: Optional[list[UploadFile]], space_id: Optional[str]):
+    if space_id is None and not files:
+        raise HTTPException(status_code=400, detail="Upload files or pass a space_id")
+    if space_id is not None:
+        try:
+            check_space_id(space_id)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
 @app.post("/generate-video/")
-async def generate_video(prompt: str = Form(...), files: list[UploadFile] = File(...)):
-    video_id = str(uuid.uuid4())
-    temp_dir = "temp_uploads"
-    os.makedirs(temp_dir, exist_ok=True)
-
-    for file in files:
-        file_path = os.path.join(temp_dir, file.filename)
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
-
-    documents = []
-    for file_name in os.listdir(temp_dir):
-        file_path = os.path.join(temp_dir, file_name)
-        if file_name.endswith('.pdf'):
-            loader = PyPDFLoader(file_path)
-        elif file_name.endswith('.txt'):
-            loader = TextLoader(file_path)
-        elif file_name.endswith('.docx'):
-            loader = Docx2txtLoader(file_path)
-        else:
-            print(f"unsupported file type: {file_name}")
-            continue
-        documents.extend(loader.load())
+async def generate_video(prompt: str = Form(...), files: Optional[list[UploadFile]] = File(None), space_id: Optional[str] = Form(None)):
+    check_generate_inputs(files, space_id)
+    # Each request gets its own workspace so concurrent requests never see
+    # or delete each other's uploads.
+    temp_dir = tempfile.mkdtemp(prefix="lumina_upload_")
+    try:
+        file_paths, file_hashes = await save_uploads(files or [], temp_dir)
+    except Exception:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+        raise
+    try:
+        return await generate_video_once(prompt, file_paths, file_hashes, temp_dir, space_id=space_id)
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"Video generation failed: {e}")
+        return JSONResponse(status_code=500, content={"error": str(e)})
+
+@app.post("/jobs/generate-video/", status_code=202)
+async def submit_generate_video(prompt: str = Form(...), files: Optional[list[UploadFile]] = File(None), space_id: Optional[str] = Form(None)):
+    check_generate_inputs(files, space_id)
+    # Uploads are only readable during the request, so copy them into the
+    # job's workspace before queueing. The workspace is removed when the job ends.
+    if space_id is not None and not files:
+        try:
+            has_documents = bool(await space_indexes.file_hashes(space_id))
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        if not has_documents:
+            raise HTTPException(status_code=400, detail=f"Space {space_id} has no documents; upload files to it first")
+    temp_dir = tempfile.mkdtemp(prefix="lumina_upload_")
+    try:
+        file_paths, file_hashes = await save_uploads(files or [], temp_dir)
+
+        async def run(report):
+            return await generate_video_once(prompt, file_paths, file_hashes, temp_dir, report=report, space_id=space_id)
+
+        job = job_manager.submit(
+            "generate-video", run,
+            cleanup=lambda: shutil.rmtree(temp_dir, ignore_errors=True),
+        )
+    except QueueFullError as e:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "30"})
+    except Exception:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+        raise
+    return {
+        "job_id": job.id,
+        "status": job.status,
+        "status_url": f"/jobs/{job.id}",
+        "events_url": f"/jobs/{job.id}/events",
+    }
 
-    text_splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=200)
-    chunks = text_splitter.split_documents(documents)
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    job = job_manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job.to_dict()
 
-    embeddings = HuggingFaceEmbeddings(model_name="all-MiniLM-L6-v2")
-    vectorstore = FAISS.from_documents(chunks, embeddings)
-    retriever = vectorstore.as_retriever(search_kwargs={"k":10})
+@app.get("/jobs/{job_id}/events")
+async def stream_job_events(job_id: str):
+    if job_manager.get(job_id) is None:
+        raise HTTPException(status_code=404, detail="Job not found")
 
+    async def event_stream():
+        async for event in job_manager.events(job_id):
+            yield f"event: {event['event']}\ndata: {json.dumps(event)}\n\n"
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream")
+
+@app.get("/spaces/{space_id}/files")
+async def list_space_files(space_id: str):
+    try:
+        return {"space_id": space_id, "files": await space_indexes.files(space_id)}
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.post("/spaces/{space_id}/files")
+async def add_space_files(space_id: str, files: list[UploadFile] = File(...)):
+    """Embed the uploaded files into the space's index; files it already has are skipped."""
+    temp_dir = tempfile.mkdtemp(prefix="lumina_upload_")
+    try:
+        file_paths, file_hashes = await save_uploads(files, temp_dir)
+        result = await space_indexes.add_files(space_id, file_paths, file_hashes, upload_names(file_paths))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+    return {"space_id": space_id, **result}
+
+@app.delete("/spaces/{space_id}/files/{file_hash}")
+async def remove_space_file(space_id: str, file_hash: str):
+    try:
+        removed = await space_indexes.remove_file(space_id, file_hash)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if not removed:
+        raise HTTPException(status_code=404, detail="File not found in space")
+    return {"space_id": space_id, "removed": file_hash}
+
+@app.delete("/spaces/{space_id}")
+async def delete_space(space_id: str):
+    try:
+        await space_indexes.delete(space_id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"space_id": space_id, "deleted": True}
+
+async def save_uploads(files: list[UploadFile], temp_dir: str):
+    file_paths = []
+    file_hashes = []
+    for i, file in enumerate(files):
+        file_name = os.path.basename(file.filename or f"upload_{i}")
+        file_path = os.path.join(temp_dir, f"{i}_{file_name}")
+        file_hash = await run_in_thread(save_upload, file, file_path)
+        file_paths.append(file_path)
+        file_hashes.append(f"{file_hash}{os.path.splitext(file_name)[1].lower()}")
+    return file_paths, file_hashes
+
+def upload_names(file_paths: list[str]) -> list[str]:
+    """Original file names of paths written by `save_uploads`."""
+    return [os.path.basename(file_path).split("_", 1)[1] for file_path in file_paths]
+
+async def load_vectorstore(file_paths: list[str], file_hashes: list[str]) -> FAISS:
+    index_key = index_cache_key(file_hashes, CHUNK_SIZE, CHUNK_OVERLAP, embedding_service.model_name, index_config())
+    embeddings = embedding_service
+    vectorstore = await run_in_thread(index_cache.load, index_key, embeddings)
+    if vectorstore is None:
+        # Pages are parsed in the process pool and embedded batch by batch
+        # as they arrive, instead of loading every file before embedding.
+        text_splitter = RecursiveCharacterTextSplitter(chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP)
+        vectorstore = await build_vectorstore(file_paths, embeddings, text_splitter)
+        # Large collections are rebuilt into a compact approximate index.
+        vectorstore.index, report = await run_in_thread(compact_index, vectorstore.index)
+        if report is not None:
+            index_builds.append(report)
+        await run_in_thread(index_cache.save, index_key, vectorstore)
+    else:
+        # nprobe/efSearch are not part of the key; apply the current ones.
+        tune_index(vectorstore.index)
+        print(f"Loaded cached index {index_key}")
+    return vectorstore
+
+def retrieve_context(vectorstore: FAISS, query_emb: list[float]) -> str:
+    retrieved_docs, retrieved_vectors = search_with_vectors(vectorstore, query_emb, k=10)
+    reranked_docs = rerank(query_emb, retrieved_docs, retrieved_vectors)
+    return "\n\n".join(doc.page_content for doc in reranked_docs)
+
+async def generate_video_once(prompt: str, file_paths: list[str], file_hashes: list[str], temp_dir: str, report=None, space_id: Optional[str] = None):
+    """
+    `run_generate_video`, deduplicated by uploaded content and prompt: a
+    recent identical request's result is returned as-is, and an identical
+    request still running is joined rather than repeated.
+
+    With a `space_id`, the uploads are first added to that space's index and
+    the whole space is the document set.
+
+    Takes ownership of `temp_dir`. The run that uses it removes it when it
+    finishes, even if this caller goes away first; otherwise it is removed
+    as soon as an existing result is used instead.
+    """
+    report = report or (lambda stage, **info: None)
+    started = False
+
+    async def run():
+        try:
+            return await run_generate_video(prompt, file_paths, document_hashes, temp_dir, report=report, space_id=space_id)
+        finally:
+            shutil.rmtree(temp_dir, ignore_errors=True)
+
+    def start():
+        nonlocal started
+        started = True
+        return run()
+
+    try:
+        document_hashes = file_hashes
+        if space_id is not None:
+            try:
+                if file_paths:
+                    await space_indexes.add_files(space_id, file_paths, file_hashes, upload_names(file_paths))
+                document_hashes = await space_indexes.file_hashes(space_id)
+            except ValueError as e:
+                raise HTTPException(status_code=400, detail=str(e))
+            if not document_hashes:
+                raise HTTPException(status_code=400, detail=f"Space {space_id} has no documents; upload files to it first")
+        result, status = await generation_memo.run(generation_key(document_hashes, prompt), start)
+    finally:
+        if not started:
+            shutil.rmtree(temp_dir, ignore_errors=True)
+    if status != "miss":
+        print(f"Reusing the result of an identical request ({status})")
+        report("deduplicated", source=status)
+        result = {**result, "deduplicated": status}
+    return result
+
+async def run_generate_video(prompt: str, file_paths: list[str], file_hashes: list[str], temp_dir: str, report=None, space_id: Optional[str] = None):
+    report = report or (lambda stage, **info: None)
+    video_id = str(uuid.uuid4())
+
+    async def index():
+        if space_id is not None:
+            # The space's index is already built and kept warm by the store.
+            return None
+        return await load_vectorstore(file_paths, file_hashes)
+
+    async def query():
+        return await run_in_thread(embedding_service.embed_query, prompt)
+
+    async def context(index, query):
+        if space_id is not None:
+            context = await space_indexes.use(space_id, retrieve_context, query)
+            if context is None:
+                raise ValueError(f"Space {space_id} has no indexed documents")
+            return context
+        return await run_in_thread(retrieve_context, index, query)
+
+    async def main_content(context, query):
+        return await generate_main_content(context, video_id, temp_dir, file_hashes, query)
+
+    async def video(context):
+        return await generate_and_upload_video(prompt, context, video_id, report)
+
+    # The summary/quiz branch and the video branch only share the retrieved
+    # context, so they run side by side.
+    results, timings = await run_stages([
+        Stage("index", index),
+        Stage("query", query),
+        Stage("context", context, deps=("index", "query")),
+        Stage("main_content", main_content, deps=("context", "query")),
+        Stage("video", video, deps=("context",)),
+    ], report=report)
+
+    video_url, placeholder_video = results["video"]
+    return {
+        "message": "Video generated successfully!",
+        "video_url": video_url,
+        "main_content_url": results["main_content"],
+        "placeholder_video": placeholder_video,
+        "timings": timings,
+    }
 
-    retrieved_docs = retriever.get_relevant_documents(prompt)
-    query_emb = np.array(embeddings.embed_query(prompt))
-    reranked_docs = sorted(
-    retrieved_docs,
-    key=lambda doc: np.dot(query_emb, np.array(embeddings.embed_documents([doc.page_content])[0])),
-    reverse=True
-    )
-    context = "\n\n".join(doc.page_content for doc in reranked_docs)
+MAIN_CONTENT_MODEL = "claude-3-5-sonnet-20241022"
 
-    anthropic = Anthropic(api_key=os.getenv("ANTHROPIC_API_KEY"))
+async def generate_main_content(context: str, video_id: str, temp_dir: str, file_hashes: list[str], query_emb: list[float]):
+    anthropic = clients.anthropic
 
     main_content_url = None
     try:
@@ -477,9 +768,18 @@ Context: {context}
             SystemMessage(content="You are an expert educational content creator. Generate summary and questions in JSON."),
             HumanMessage(content=main_content_prompt)
         ]
+        # The same documents with the same or a near-identical prompt get
+        # the summary and questions already generated for them.
+        cache_key = llm_cache_key(MAIN_CONTENT_MODEL, main_content_prompt)
+        cache_scope = llm_cache_key(MAIN_CONTENT_MODEL, "main_content", sorted(file_hashes))
+        cached_url = llm_cache.get(cache_key, scope=cache_scope, embedding=query_emb)
+        if cached_url is not None:
+            print("MAIN CONTENT CACHE HIT ", cached_url)
+            return cached_url
+
         # Use Claude for main content generation
-        response = anthropic.messages.create(
-            model="claude-3-5-sonnet-20241022",
+        response = await anthropic.messages.create(
+            model=MAIN_CONTENT_MODEL,
             max_tokens=4000,
             temperature=0.7,
             messages=[
@@ -507,12 +807,17 @@ Context: {context}
         with open(main_content_path, "w", encoding="utf-8") as f:
             json.dump(main_content_data, f, ensure_ascii=False, indent=2)
         main_content_storage_path = f"{video_id}_maincontent.json"
-        main_content_url = upload_file_to_supabase(main_content_path, main_content_storage_path)
+        main_content_url = await upload_file_to_supabase(main_content_path, main_content_storage_path, content_type="application/json")
         print("MAIN CONTENT UPLOADED ", main_content_url)
+        llm_cache.put(cache_key, main_content_url, scope=cache_scope, embedding=query_emb)
     except Exception as e:
         print(f"Error generating/uploading main content: {str(e)}")
         main_content_url = None
+    return main_content_url
 
+async def generate_and_upload_video(prompt: str, context: str, video_id: str, report):
+    """Returns the video's public URL and whether it is the placeholder video."""
+    placeholder_video = False
     try:
         llm_prompt = f"""Create a Khan Academy-style educational video about: {prompt} Context from educational materials: {context}. Generate a clear, engaging, and visually appealing educational animation that explains this concept in a way similar to Khan Academy or 3Blue1Brown videos. The video should be informative, well-paced, and use visual elements to enhance understanding."""
  
@@ -521,9 +826,10 @@ Context: {context}
             'prompt': llm_prompt,
         }
         
-        response = requests.post(
+        response = await clients.http.post(
             "https://api.kodisc.com/generate/video",
-            data=form_data
+            data=form_data,
+            timeout=KODISC_TIMEOUT
         )
         print(response)
         if response.status_code != 200:
@@ -542,71 +848,46 @@ Context: {context}
         
         print(f"Video generated successfully: {kodisc_video_url}")
         
-        print("Downloading video from CDN...")
-        video_response = requests.get(kodisc_video_url, stream=True)
-        video_response.raise_for_status()
-        
-        # Save the video locally
-        local_video_path = os.path.join(temp_dir, f"{video_id}.mp4")
-        with open(local_video_path, 'wb') as f:
-            for chunk in video_response.iter_content(chunk_size=8192):
-                f.write(chunk)
-        
-        print(f"Video downloaded to: {local_video_path}")
+        report("video_upload", kodisc_video_url=kodisc_video_url)
+        print("Streaming video from CDN to Supabase...")
         storage_path = f"{video_id}.mp4"
-        public_url = upload_file_to_supabase(local_video_path, storage_path)
+        public_url = await transfer_to_supabase(kodisc_video_url, storage_path)
         
         print(f"✅ Video uploaded to Supabase: {public_url}")
         
     except Exception as e:
         print(f"Error generating video: {str(e)}")
+        report("video_upload", fallback=True)
+        placeholder_video = True
         placeholder_url = "https://miyagilabs.ai/landingvid.mp4"
-        local_video_path = os.path.join(temp_dir, f"{video_id}.mp4")
-        with requests.get(placeholder_url, stream=True) as r:
-            r.raise_for_status()
-            with open(local_video_path, 'wb') as f:
-                for chunk in r.iter_content(chunk_size=8192):
-                    f.write(chunk)
         storage_path = f"{video_id}.mp4"
         try:
-            public_url = upload_file_to_supabase(local_video_path, storage_path)
+            public_url = await transfer_to_supabase(placeholder_url, storage_path)
         except Exception as upload_error:
-            shutil.rmtree(temp_dir)
-            return {"error": f"Error uploading to Supabase: {str(upload_error)}"}, 500
+            raise Exception(f"Error uploading to Supabase: {str(upload_error)}")
+    return public_url, placeholder_video
 
-    shutil.rmtree(temp_dir)
-    return {
-        "message": "Video generated successfully!",
-        "video_url": public_url,
-        "main_content_url": main_content_url
-    }
+NARRATION_MODEL = "gpt-4o"
 
 class NarrationRequest(BaseModel):
     video_path: str = "neuralnet.mp4"
     prompt: str
+    seconds_per_frame: float = 2
+    # Set to sample on visual changes instead of a fixed grid (0-1, higher keeps fewer frames).
+    scene_threshold: Optional[float] = None
+
+def iter_video_frames(video_path, seconds_per_frame=2, strategy=FRAME_SAMPLER_STRATEGY, scene_threshold=None, **encode_options):
+    """Lazily yield `(timestamp, base64_jpeg)` for the sampled frames of a video."""
+    frames = sample_frames(video_path, seconds_per_frame, strategy=strategy, scene_threshold=scene_threshold)
+    return encode_frames(frames, **encode_options)
 
-def process_video(video_path, seconds_per_frame=2):
+def process_video(video_path, seconds_per_frame=2, strategy=FRAME_SAMPLER_STRATEGY, scene_threshold=None, **encode_options):
     base64Frames = []
-    video = cv2.VideoCapture(video_path)
-    total_frames = int(video.get(cv2.CAP_PROP_FRAME_COUNT))
-    fps = video.get(cv2.CAP_PROP_FPS)
-    frames_to_skip = int(fps * seconds_per_frame)
-    curr_frame=0
     timestamps = []
 
-    while curr_frame < total_frames - 1:
-        video.set(cv2.CAP_PROP_POS_FRAMES, curr_frame)
-        success, frame = video.read()
-        if not success:
-            break
-        _, buffer = cv2.imencode(".jpg", frame)
-        base64Frames.append(base64.b64encode(buffer).decode("utf-8"))
-        
-        timestamp = curr_frame / fps
+    for timestamp, frame_data in iter_video_frames(video_path, seconds_per_frame, strategy, scene_threshold, **encode_options):
+        base64Frames.append(frame_data)
         timestamps.append(timestamp)
-        
-        curr_frame += frames_to_skip
-    video.release()
     
     print(f"Extracted {len(base64Frames)} frames")
     return base64Frames, timestamps
@@ -616,156 +897,69 @@ async def create_final_video(narration_data: dict, video_path: str, output_path:
     Generates audio using Eleven Labs, synchronizes it with the video by adjusting
     video speed, and compiles the final video.
     """
-    print("Initializing Eleven Labs client...")
-    client = ElevenLabs(api_key=os.getenv("ELEVENLABS_API_KEY"))
-
-    # 1. Generate and stitch audio clips
-    print("Generating and stitching audio clips...")
-    stitched_audio = AudioSegment.empty()
-    last_timestamp_sec = 0.0
+    client = clients.elevenlabs
 
+    # 1. Generate every clip concurrently, then stitch them in timestamp order
+    entries = []
     for entry in narration_data.get("narration", []):
         dialogue = entry.get("dialogue", "").strip()
         timestamp_sec = float(entry.get("timestamp", 0))
+        if dialogue:
+            entries.append((timestamp_sec, dialogue))
+    entries.sort(key=lambda item: item[0])
 
-        if not dialogue:
+    print(f"Generating {len(entries)} audio clips...")
+    try:
+        clips = await synthesize_all(client, [dialogue for _, dialogue in entries], cache=tts_cache)
+    except ApiError as e:
+        print("="*50)
+        print("FATAL ERROR: An API error occurred with Eleven Labs.")
+        print("This is likely an issue with your API key or account.")
+        print(f"DETAILS: {e.body}")
+        print("="*50)
+        # Re-raise the exception to be caught by the main endpoint handler
+        raise e
+
+    print("Stitching audio clips...")
+    timeline = AudioTimeline(sample_rate=TTS_SAMPLE_RATE)
+    cues = []
+
+    for (timestamp_sec, dialogue), full_audio_bytes in zip(entries, clips):
+        if not full_audio_bytes:
+            print(f"Warning: Received empty audio for dialogue: '{dialogue}'. Skipping.")
             continue
-        
-        # Add silence from the end of the last clip to the start of this one
-        silence_duration_ms = (timestamp_sec - last_timestamp_sec) * 1000
-        if silence_duration_ms > 0:
-            stitched_audio += AudioSegment.silent(duration=silence_duration_ms)
-        
-        try:
-            # Generate audio for the current dialogue
-            audio_data = client.text_to_speech.convert(
-                text=dialogue,
-                voice_id="JBFqnCBsd6RMkjVDRZzb", # Using a valid voice_id from docs
-                model_id="eleven_multilingual_v2"
-            )
-
-            # Eleven Labs returns an iterator of bytes, which we join
-            full_audio_bytes = b"".join(audio_data)
-
-            if not full_audio_bytes:
-                print(f"Warning: Received empty audio for dialogue: '{dialogue}'. Skipping.")
-                continue
-
-            try:
-                segment_audio = AudioSegment(
-                    data=full_audio_bytes,
-                    sample_width=2,
-                    frame_rate=24000, 
-                    channels=1
-                )
-            except ValueError as e:
-                print("-" * 50)
-                print(f"ERROR: Corrupt audio data received for dialogue: '{dialogue}'.")
-                print("This usually happens when the API returns an error message instead of audio.")
-                print(f"Underlying error: {e}")
-                print(f"Data received (first 100 bytes): {full_audio_bytes[:100]}")
-                print("Please check your Eleven Labs API key and account status.")
-                print("-" * 50)
-                continue # Skip this faulty audio clip
-
-            stitched_audio += segment_audio
-            last_timestamp_sec = timestamp_sec + (len(segment_audio) / 1000.0)
-
-        except ApiError as e:
-            print("="*50)
-            print("FATAL ERROR: An API error occurred with Eleven Labs.")
-            print("This is likely an issue with your API key or account.")
-            print(f"DETAILS: {e.body}")
-            print("="*50)
-            # Re-raise the exception to be caught by the main endpoint handler
-            raise e
-    
-    # Save the final stitched audio to a temporary file
-    temp_audio_path = "backend/temp_full_audio.mp3"
-    stitched_audio.export(temp_audio_path, format="mp3")
-    print(f"Stitched audio saved to {temp_audio_path}")
-
-    # 2. Synchronize and compile video
-    print("Loading video and audio clips for synchronization...")
-    video_clip = VideoFileClip(video_path)
-    audio_clip = AudioFileClip(temp_audio_path)
-
-    video_duration = video_clip.duration
-    audio_duration = audio_clip.duration
-
-    print(f"Original video duration: {video_duration:.2f}s")
-    print(f"Generated audio duration: {audio_duration:.2f}s")
-
-    # Calculate speed factor
-    if audio_duration > 0:
-        speed_factor = video_duration / audio_duration
-        print(f"Calculated video speed factor: {speed_factor:.2f}")
-        # Apply speed adjustment
-        final_clip = video_clip.fx(vfx.speedx, speed_factor)
-    else:
-        print("Warning: Audio duration is zero. Using original video.")
-        final_clip = video_clip
 
-    # Set the new audio
-    final_clip = final_clip.set_audio(audio_clip)
-
-    # 3. Write final video
-    print(f"Writing final video to {output_path}...")
-    final_clip.write_videofile(output_path, codec="libx264", audio_codec="aac", temp_audiofile='backend/temp-audio.m4a', remove_temp=True)
+        try:
+            start_sec = timeline.add(timestamp_sec, full_audio_bytes)
+        except ValueError as e:
+            print("-" * 50)
+            print(f"ERROR: Corrupt audio data received for dialogue: '{dialogue}'.")
+            print("This usually happens when the API returns an error message instead of audio.")
+            print(f"Underlying error: {e}")
+            print(f"Data received (first 100 bytes): {full_audio_bytes[:100]}")
+            print("Please check your Eleven Labs API key and account status.")
+            print("-" * 50)
+            continue # Skip this faulty audio clip
+        cues.append((timestamp_sec, start_sec, len(full_audio_bytes) / 2 / TTS_SAMPLE_RATE))
+
+    print(f"Stitched {timeline.duration:.2f}s of narration audio")
+
+    # 2. Synchronize and compile video. The ffmpeg backend does its work in a
+    # subprocess, so a thread is enough to keep it off the event loop and
+    # avoids pickling the PCM track over to a worker. Only the moviepy
+    # backend encodes in Python and needs the process pool. The PCM track is
+    # handed over as-is, so the audio is only encoded once, by the muxer, and
+    # the cues let the renderer line each segment of video up with its line.
+    run = run_in_process if RENDER_BACKEND == "moviepy" else run_in_thread
+    await run(render_final_video, video_path, timeline.render(), TTS_SAMPLE_RATE, output_path, cues)
 
-    # 4. Clean up temporary audio file
-    video_clip.close()
-    audio_clip.close()
-    final_clip.close()
-    os.remove(temp_audio_path)
-    
     print("Final video created successfully.")
 
 @app.post("/generate-narration/")
 async def generate_narration(request: NarrationRequest):
     try:
-        base64Frames, timestamps = process_video(request.video_path)
-        
-        # Instantiate the OpenAI client
-        client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-        
-    
-        content_payload = [
-            {
-                "type": "text",
-                "text": f"You are an expert scriptwriter for educational videos. Your task is to create a narration script for a video about '{request.prompt}'. I will provide you with a series of frames from the video, each with its exact timestamp. Your script should be engaging, clear, and synchronized with the visuals. The dialogue will be based on whatever the video is currently topic or explaining. It will change accordingly to the current video content. Please output the script as a JSON object with a 'narration' key, which is a list of objects, each with 'timestamp' and 'dialogue'. Ensure the timestamps in your output correspond to the ones I provide. Here are the frames:"
-            }
-        ]
-
-        for frame_data, timestamp in zip(base64Frames, timestamps):
-            content_payload.append({
-                "type": "text",
-                "text": f"Frame at timestamp: {timestamp:.2f} seconds"
-            })
-            content_payload.append({
-                "type": "image_url",
-                "image_url": {
-                    "url": f"data:image/jpeg;base64,{frame_data}",
-                    "detail": "low"
-                }
-            })
+        client = clients.openai
 
-        messages = [
-            {
-                "role": "user",
-                "content": content_payload
-            }
-        ]
-
-        response = client.chat.completions.create(
-            model="gpt-4o",
-            max_tokens=4000,
-            temperature=0.7,
-            messages=messages
-        )
-        
-        narration_json = response.choices[0].message.content
-        
         def extract_json(text):
             text = text.strip()
             if text.startswith('json'):
@@ -776,28 +970,98 @@ async def generate_narration(request: NarrationRequest):
             if match:
                 return match.group(1)
             return text
-            
-        narration_data = json.loads(extract_json(narration_json))
+
+        prompt_emb = await run_in_thread(embedding_service.embed_query, request.prompt)
+
+        async def narrate_window(window):
+            instructions = [
+                {
+                    "type": "text",
+                    "text": f"You are an expert scriptwriter for educational videos. Your task is to create a narration script for a video about '{request.prompt}'. I will provide you with a series of frames from the video, each with its exact timestamp. Your script should be engaging, clear, and synchronized with the visuals. The dialogue will be based on whatever the video is currently topic or explaining. It will change accordingly to the current video content. Please output the script as a JSON object with a 'narration' key, which is a list of objects, each with 'timestamp' and 'dialogue'. Ensure the timestamps in your output correspond to the ones I provide. Here are the frames:"
+                },
+                {
+                    "type": "text",
+                    "text": f"These frames cover {window.start:.2f} to {window.end:.2f} seconds, which may be only one segment of a longer video. Only narrate what these frames show."
+                }
+            ]
+
+            # The same frames narrated for the same or a near-identical prompt
+            # reuse the earlier script. Each frame is hashed once, off the
+            # event loop, and both keys are built from those digests.
+            digests = await run_in_thread(frame_digests, window.frames)
+            cache_key = llm_cache_key(NARRATION_MODEL, instructions, digests)
+            cache_scope = llm_cache_key(NARRATION_MODEL, "narration", digests)
+            cached = llm_cache.get(cache_key, scope=cache_scope, embedding=prompt_emb)
+            if cached is not None:
+                return cached
+
+            content_payload = list(instructions)
+            for timestamp, frame_data in window.frames:
+                content_payload.append({
+                    "type": "text",
+                    "text": f"Frame at timestamp: {timestamp:.2f} seconds"
+                })
+                content_payload.append({
+                    "type": "image_url",
+                    "image_url": {
+                        "url": f"data:image/jpeg;base64,{frame_data}",
+                        "detail": "low"
+                    }
+                })
+
+            messages = [
+                {
+                    "role": "user",
+                    "content": content_payload
+                }
+            ]
+
+            response = await client.chat.completions.create(
+                model=NARRATION_MODEL,
+                max_tokens=4000,
+                temperature=0.7,
+                messages=messages
+            )
+
+            narration_json = response.choices[0].message.content
+            window_data = json.loads(extract_json(narration_json))
+            if 'narration' not in window_data or not isinstance(window_data['narration'], list):
+                raise ValueError("Invalid JSON structure for narration")
+            llm_cache.put(cache_key, window_data['narration'], scope=cache_scope, embedding=prompt_emb)
+            return window_data['narration']
+
+        # The frame timeline is narrated in overlapping windows, several at a
+        # time, so latency and the blast radius of a failed call scale with
+        # the window size rather than the video length.
+        frames = iter_video_frames(request.video_path, request.seconds_per_frame, scene_threshold=request.scene_threshold)
+        narration, failed_windows, thinned_windows = await narrate_in_windows(frames, narrate_window)
+        if failed_windows:
+            print(f"Narration windows {failed_windows} failed and were left out")
+        narration_data = {"narration": narration}
 
         try:
             video_filename = os.path.basename(request.video_path)
             base_filename, _ = os.path.splitext(video_filename)
             output_filename = f"{base_filename}_narration.json"
 
-            output_filepath = os.path.join(os.path.dirname(_file_), output_filename)
+            output_filepath = os.path.join(os.path.dirname(__file__), output_filename)
 
-            with open(output_filepath, 'w') as f:
-                json.dump(narration_data, f, indent=4)
+            def write_narration():
+                with open(output_filepath, 'w') as f:
+                    json.dump(narration_data, f, indent=4)
+            await run_in_thread(write_narration)
             
             print(f"Narration script successfully saved to {output_filepath}")
 
             # Generate the final video with narration
-            output_video_path = "backend/OUTPUT.mp4"
+            output_video_path = os.path.join(os.path.dirname(__file__), f"{base_filename}_{uuid.uuid4().hex[:8]}_narrated.mp4")
             await create_final_video(narration_data, request.video_path, output_video_path)
 
             response_data = {
                 "narration_file_path": output_filepath,
-                "final_video_path": output_video_path
+                "final_video_path": output_video_path,
+                "failed_windows": failed_windows,
+                "thinned_windows": thinned_windows,
             }
             return response_data
         except Exception as e:
@@ -814,5 +1078,5 @@ async def generate_narration(request: NarrationRequest):
         return JSONResponse(status_code=500, content={"error": str(e)})
 
 
-if _name_ == "_main_":
+if __name__ == "__main__":
     uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
@@ -0,0 +1,309 @@
+import asyncio
+import glob
+import hashlib
+import json
+import os
+import re
+import shlex
+import shutil
+import signal
+import subprocess
+import tempfile
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from disk_cache import DiskLRUCache
+from executors import run_in_thread
+from jobs import Job, QueueFullError, Reporter
+from video_render import FFMPEG_BINARY
+
+MANIM_BINARY = os.getenv("MANIM_BINARY", "manim")
+MANIM_WORKERS = int(os.getenv("MANIM_WORKERS", str(max(1, (os.cpu_count() or 2) // 2))))
+MANIM_QUEUE_SIZE = int(os.getenv("MANIM_QUEUE_SIZE", "16"))
+MANIM_TIMEOUT_SECONDS = float(os.getenv("MANIM_TIMEOUT_SECONDS", "300"))
+# Address-space limit per render; 0 disables it.
+MANIM_MEMORY_LIMIT_MB = int(os.getenv("MANIM_MEMORY_LIMIT_MB", "4096"))
+# util-linux prlimit applies the limit in the child's own process, so nothing
+# runs between fork and exec in this (multi-threaded) server.
+PRLIMIT_BINARY = os.getenv("PRLIMIT_BINARY", "prlimit")
+MANIM_CACHE_DIR = os.getenv("MANIM_CACHE_DIR", "manim_cache")
+MANIM_CACHE_MAX_MB = int(os.getenv("MANIM_CACHE_MAX_MB", "4096"))
+
+QUALITY_FLAGS = {
+    "low": "-ql",
+    "medium": "-qm",
+    "high": "-qh",
+    "production": "-qp",
+    "4k": "-qk",
+}
+# Named presets: a quick low-res preview and the full-quality final render.
+QUALITY_FLAGS["preview"] = QUALITY_FLAGS["low"]
+QUALITY_FLAGS["final"] = QUALITY_FLAGS["4k"]
+
+SCENE_PATTERN = re.compile(r"^class\s+(\w+)\s*\(\s*(?:\w+\.)?\w*Scene\s*\)", re.MULTILINE)
+
+
+class RenderError(Exception):
+    pass
+
+
+def scene_names(source: str) -> List[str]:
+    """Names of the Scene subclasses defined in `source`, in definition order."""
+    return SCENE_PATTERN.findall(source)
+
+
+def render_cache_key(source: str, scene: str, quality: str) -> str:
+    """Content address for `scene` from `source` rendered at `quality`."""
+    payload = json.dumps({"source": source, "scene": scene, "quality": quality}, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest() + ".mp4"
+
+
+def concat_videos(paths: List[str], output_path: str):
+    """
+    Join MP4s with ffmpeg's concat demuxer. The streams are copied, not
+    re-encoded, which is lossless because every scene of a render comes out
+    of manim with the same codec settings.
+    """
+    list_dir = tempfile.mkdtemp(prefix="concat_")
+    try:
+        list_path = os.path.join(list_dir, "inputs.txt")
+        with open(list_path, "w", encoding="utf-8") as f:
+            for path in paths:
+                escaped = os.path.abspath(path).replace("'", "'\\''")
+                f.write(f"file '{escaped}'\n")
+        result = subprocess.run(
+            [FFMPEG_BINARY, "-y", "-v", "error", "-f", "concat", "-safe", "0", "-i", list_path,
+             "-c", "copy", "-movflags", "+faststart", "-f", "mp4", output_path],
+            capture_output=True,
+            text=True,
+        )
+        if result.returncode != 0:
+            raise RenderError(f"ffmpeg concat failed with exit code {result.returncode}: {result.stderr[-2000:]}")
+    finally:
+        shutil.rmtree(list_dir, ignore_errors=True)
+
+
+def limited_command(command: List[str], memory_limit_mb: int) -> List[str]:
+    """`command` run under an address-space limit of `memory_limit_mb`, if prlimit is available."""
+    if not memory_limit_mb:
+        return command
+    prlimit = shutil.which(PRLIMIT_BINARY)
+    if prlimit is None:
+        print(f"{PRLIMIT_BINARY} not found; Manim renders run without a memory limit")
+        return command
+    return [prlimit, f"--as={memory_limit_mb * 1024 * 1024}", "--", *command]
+
+
+class ManimRenderFarm:
+    """
+    Renders Manim scenes in at most `workers` concurrent manim processes.
+
+    The farm runs whatever code it is given, so it is a library for code the
+    app generates itself; no endpoint takes Manim source from a request.
+
+    Rendered MP4s are cached on disk by a hash of the scene source, scene name
+    and quality, and a render already in progress is shared with every caller
+    asking for the same key, so identical code is never rendered twice. At
+    most `max_queue` distinct renders wait for a worker; beyond that `render`
+    raises QueueFullError. Each render is killed after `timeout` seconds and
+    runs under an address-space limit where the platform supports one.
+    """
+
+    def __init__(
+        self,
+        workers: int = MANIM_WORKERS,
+        max_queue: int = MANIM_QUEUE_SIZE,
+        timeout: float = MANIM_TIMEOUT_SECONDS,
+        memory_limit_mb: int = MANIM_MEMORY_LIMIT_MB,
+        cache_dir: str = MANIM_CACHE_DIR,
+        cache_max_bytes: int = MANIM_CACHE_MAX_MB * 1024 * 1024,
+        command: Optional[List[str]] = None,
+    ):
+        self.workers = workers
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self.memory_limit_mb = memory_limit_mb
+        self.command = command or shlex.split(MANIM_BINARY)
+        self.cache = DiskLRUCache(cache_dir, cache_max_bytes)
+        self.rendered = 0
+        self.deduplicated = 0
+        self.failed = 0
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._in_flight: Dict[str, asyncio.Task] = {}
+        self._running = 0
+
+    async def render(self, source: str, scene: Optional[str] = None, quality: str = "high") -> str:
+        """Path of the cached MP4 for `scene` (default: the first Scene in `source`)."""
+        if quality not in QUALITY_FLAGS:
+            raise ValueError(f"Unknown quality '{quality}', expected one of {list(QUALITY_FLAGS)}")
+        if scene is None:
+            scenes = scene_names(source)
+            if not scenes:
+                raise RenderError("No Scene subclass found in the Manim source")
+            scene = scenes[0]
+
+        key = render_cache_key(source, scene, quality)
+        task = self._in_flight.get(key)
+        if task is not None:
+            self.deduplicated += 1
+        else:
+            path = self.cache.get(key)
+            if path is not None:
+                return path
+            if len(self._in_flight) >= self.workers + self.max_queue:
+                raise QueueFullError(f"Manim render queue is full ({self.max_queue} pending)")
+            task = asyncio.ensure_future(self._render(key, source, scene, quality))
+            self._in_flight[key] = task
+            task.add_done_callback(lambda _: self._in_flight.pop(key, None))
+        # Shielded so a caller going away does not cancel a render others are waiting on.
+        return await asyncio.shield(task)
+
+    async def render_video(self, source: str, quality: str = "high") -> str:
+        """
+        Path of the cached MP4 of every Scene in `source`, in definition order.
+        Each scene renders in its own worker at the same time, and the results
+        are concatenated without re-encoding.
+        """
+        scenes = scene_names(source)
+        if not scenes:
+            raise RenderError("No Scene subclass found in the Manim source")
+        if len(scenes) == 1:
+            return await self.render(source, scenes[0], quality)
+
+        key = render_cache_key(source, "+".join(scenes), quality)
+        path = self.cache.get(key)
+        if path is not None:
+            return path
+        # Pinned from before the first scene lands until the join has read
+        # them all, so caching one scene cannot evict another.
+        with self.cache.pinned(*(render_cache_key(source, scene, quality) for scene in scenes)):
+            paths = await asyncio.gather(*(self.render(source, scene, quality) for scene in scenes))
+            path = await run_in_thread(self.cache.put, key, lambda tmp_path: concat_videos(paths, tmp_path))
+        await run_in_thread(self.cache.evict, key)
+        return path
+
+    async def render_source(self, source: str, scene: Optional[str] = None, quality: str = "high") -> str:
+        """Path of the cached MP4 for `scene`, or of every Scene in `source` when it is None."""
+        if scene is not None:
+            return await self.render(source, scene, quality)
+        return await self.render_video(source, quality)
+
+    async def render_with_final(
+        self,
+        source: str,
+        submit: Callable[[str, Callable[[Reporter], Awaitable[Any]]], Job],
+        scene: Optional[str] = None,
+        quality: str = "preview",
+        final_quality: Optional[str] = "final",
+    ) -> dict:
+        """
+        Render `source` at `quality` and return its path right away, with the
+        `final_quality` render queued through `submit` (a `JobManager.submit`)
+        so it runs alongside the preview and can be followed as a job.
+        """
+        for preset in (quality, final_quality):
+            if preset is not None and preset not in QUALITY_FLAGS:
+                raise ValueError(f"Unknown quality '{preset}', expected one of {list(QUALITY_FLAGS)}")
+        result = {"quality": quality}
+        if final_quality and final_quality != quality:
+            async def run(report):
+                report("rendering", quality=final_quality)
+                return {"video_path": await self.render_source(source, scene, final_quality)}
+
+            job = submit("render-manim", run)
+            result.update({
+                "final_job_id": job.id,
+                "status_url": f"/jobs/{job.id}",
+                "events_url": f"/jobs/{job.id}/events",
+            })
+        result["video_path"] = await self.render_source(source, scene, quality)
+        return result
+
+    async def _render(self, key: str, source: str, scene: str, quality: str) -> str:
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.workers)
+        async with self._slots:
+            self._running += 1
+            work_dir = tempfile.mkdtemp(prefix="manim_")
+            try:
+                video_path = await self._run_manim(work_dir, source, scene, quality)
+                path = await run_in_thread(self.cache.put, key, lambda tmp_path: shutil.move(video_path, tmp_path))
+                self.rendered += 1
+                return path
+            except Exception:
+                self.failed += 1
+                raise
+            finally:
+                self._running -= 1
+                shutil.rmtree(work_dir, ignore_errors=True)
+
+    async def _run_manim(self, work_dir: str, source: str, scene: str, quality: str) -> str:
+        script_path = os.path.join(work_dir, "scene.py")
+        with open(script_path, "w", encoding="utf-8") as f:
+            f.write(source)
+
+        cmd = limited_command(self.command, self.memory_limit_mb) + [
+            QUALITY_FLAGS[quality],
+            "--disable_caching",
+            "--media_dir", os.path.join(work_dir, "media"),
+            "-o", scene,
+            script_path,
+            scene,
+        ]
+        options = {}
+        if os.name == "posix":
+            options = {"start_new_session": True}
+
+        print(f"Running Manim {' '.join(cmd)}")
+        process = await asyncio.create_subprocess_exec(
+            *cmd,
+            cwd=work_dir,
+            stdout=asyncio.subprocess.DEVNULL,
+            stderr=asyncio.subprocess.PIPE,
+            **options,
+        )
+        try:
+            _, stderr = await asyncio.wait_for(process.communicate(), self.timeout)
+        except asyncio.TimeoutError:
+            self._kill(process)
+            await process.wait()
+            raise RenderError(f"Manim render of {scene} timed out after {self.timeout:.0f}s")
+        except asyncio.CancelledError:
+            self._kill(process)
+            raise
+        if process.returncode != 0:
+            raise RenderError(f"Manim exited with code {process.returncode}: {stderr.decode(errors='replace')[-2000:]}")
+
+        videos = glob.glob(os.path.join(work_dir, "media", "videos", "**", f"{scene}.mp4"), recursive=True)
+        if not videos:
+            raise RenderError(f"Manim finished but produced no video for {scene}")
+        return videos[0]
+
+    @staticmethod
+    def _kill(process):
+        if process.returncode is not None:
+            return
+        try:
+            if os.name == "posix":
+                os.killpg(process.pid, signal.SIGKILL)
+            else:
+                process.kill()
+        except ProcessLookupError:
+            pass
+
+    async def stop(self):
+        tasks = list(self._in_flight.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "running": self._running,
+            "queued": len(self._in_flight) - self._running,
+            "max_queue": self.max_queue,
+            "rendered": self.rendered,
+            "deduplicated": self.deduplicated,
+            "failed": self.failed,
+            "cache": self.cache.stats(),
+        }
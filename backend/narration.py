@@ -0,0 +1,168 @@
+import asyncio
+import hashlib
+import os
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Iterator, List, Optional, Tuple
+
+from executors import run_in_thread
+
+NARRATION_WINDOW_FRAMES = int(os.getenv("NARRATION_WINDOW_FRAMES", "30"))
+NARRATION_WINDOW_OVERLAP = int(os.getenv("NARRATION_WINDOW_OVERLAP", "4"))
+NARRATION_CONCURRENCY = int(os.getenv("NARRATION_CONCURRENCY", "4"))
+NARRATION_WINDOW_RETRIES = int(os.getenv("NARRATION_WINDOW_RETRIES", "1"))
+# Base64 image bytes sent in one window's call. At most NARRATION_CONCURRENCY
+# windows are held at once, so this also bounds frame memory.
+NARRATION_WINDOW_BYTE_BUDGET = int(os.getenv("NARRATION_WINDOW_BYTE_BUDGET", str(4 * 1024 * 1024)))
+
+Frame = Tuple[float, str]
+
+
+@dataclass
+class NarrationWindow:
+    """
+    A run of consecutive frames narrated in one model call. Neighbouring
+    windows share `overlap` frames for context; each window only keeps the
+    lines from `owned_start` up to the next window's `owned_start`.
+    """
+    index: int
+    frames: List[Frame]
+    owned_start: float
+
+    @property
+    def start(self) -> float:
+        return self.frames[0][0]
+
+    @property
+    def end(self) -> float:
+        return self.frames[-1][0]
+
+
+def iter_windows(frames: Iterator[Frame], window_size: int = NARRATION_WINDOW_FRAMES, overlap: int = NARRATION_WINDOW_OVERLAP) -> Iterator[NarrationWindow]:
+    """Group a frame stream into overlapping windows without reading it all first."""
+    window_size = max(1, window_size)
+    overlap = min(max(0, overlap), window_size - 1)
+    buffer: List[Frame] = []
+    index = 0
+    for frame in frames:
+        buffer.append(frame)
+        if len(buffer) == window_size:
+            yield _window(index, buffer, overlap)
+            index += 1
+            buffer = buffer[window_size - overlap:]
+    # The tail only needs its own window if it holds frames no window has seen yet.
+    if buffer and (index == 0 or len(buffer) > overlap):
+        yield _window(index, buffer, overlap)
+
+
+def _window(index: int, frames: List[Frame], overlap: int) -> NarrationWindow:
+    # Split each overlap down the middle between the two windows sharing it.
+    owned_start = float("-inf") if index == 0 else frames[overlap // 2][0]
+    return NarrationWindow(index=index, frames=list(frames), owned_start=owned_start)
+
+
+def frame_digests(frames: List[Frame]) -> List[Tuple[float, str]]:
+    """`(timestamp, sha256 of the image)` per frame, a small stand-in for the frames in cache keys."""
+    return [(timestamp, hashlib.sha256(data.encode("ascii")).hexdigest()) for timestamp, data in frames]
+
+
+def fit_window(window: NarrationWindow, byte_budget: Optional[int]) -> Tuple[NarrationWindow, int]:
+    """
+    Thin a window whose frames exceed `byte_budget` to evenly spaced frames
+    that fit, keeping its first and last frame so it still spans the same
+    time. Returns the window and how many frames were dropped.
+    """
+    frames = window.frames
+    if not byte_budget or sum(len(data) for _, data in frames) <= byte_budget:
+        return window, 0
+    count = len(frames)
+    for keep in range(count - 1, 0, -1):
+        if keep == 1:
+            indexes = [0]
+        else:
+            indexes = sorted({round(i * (count - 1) / (keep - 1)) for i in range(keep)})
+        if sum(len(frames[i][1]) for i in indexes) <= byte_budget or keep == 1:
+            thinned = NarrationWindow(index=window.index, frames=[frames[i] for i in indexes], owned_start=window.owned_start)
+            return thinned, count - len(indexes)
+    return window, 0
+
+
+def merge_narrations(results: List[Tuple[int, float, Optional[List[dict]]]]) -> List[dict]:
+    """
+    Combine per-window narration lines, given as `(window index, owned_start,
+    lines)`, into one timeline ordered by timestamp.
+    """
+    results = sorted(results, key=lambda item: item[0])
+    merged = []
+    for i, (_, owned_start, entries) in enumerate(results):
+        owned_end = results[i + 1][1] if i + 1 < len(results) else float("inf")
+        for entry in entries or []:
+            try:
+                timestamp = float(entry.get("timestamp", 0))
+            except (TypeError, ValueError):
+                continue
+            if owned_start <= timestamp < owned_end:
+                merged.append({**entry, "timestamp": timestamp})
+    merged.sort(key=lambda entry: entry["timestamp"])
+    return merged
+
+
+async def narrate_in_windows(
+    frames: Iterator[Frame],
+    narrate: Callable[[NarrationWindow], Awaitable[List[dict]]],
+    window_size: int = NARRATION_WINDOW_FRAMES,
+    overlap: int = NARRATION_WINDOW_OVERLAP,
+    concurrency: int = NARRATION_CONCURRENCY,
+    retries: int = NARRATION_WINDOW_RETRIES,
+    byte_budget: Optional[int] = NARRATION_WINDOW_BYTE_BUDGET,
+) -> Tuple[List[dict], List[int], List[int]]:
+    """
+    Narrate a frame stream window by window with at most `concurrency` model
+    calls in flight. The blocking frame stream is read on the thread pool,
+    and only as fast as windows are dispatched, so at most `concurrency`
+    windows of frames are held at once. Windows over `byte_budget` are
+    thinned to fit (see `fit_window`).
+
+    A window that still fails after `retries` retries is dropped instead of
+    failing the whole video. Returns the merged narration, the indexes of
+    the dropped windows and the indexes of the thinned ones. Raises only if
+    every window fails.
+    """
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    windows = iter_windows(frames, window_size, overlap)
+
+    async def run(window: NarrationWindow):
+        # Only the window's position is returned, so its frames are freed as
+        # soon as it is narrated rather than when the whole video is.
+        index, owned_start = window.index, window.owned_start
+        try:
+            for attempt in range(retries + 1):
+                try:
+                    return index, owned_start, await narrate(window)
+                except Exception as e:
+                    print(f"Narration of window {index} ({window.start:.2f}s-{window.end:.2f}s) failed on attempt {attempt + 1}: {e}")
+                    # The traceback would otherwise keep the frames alive.
+                    last_error = e.with_traceback(None)
+            return index, owned_start, last_error
+        finally:
+            semaphore.release()
+
+    tasks = []
+    thinned = []
+    while True:
+        await semaphore.acquire()
+        window = await run_in_thread(next, windows, None)
+        if window is None:
+            semaphore.release()
+            break
+        window, dropped = fit_window(window, byte_budget)
+        if dropped:
+            print(f"Window {window.index} ({window.start:.2f}s-{window.end:.2f}s) was over the byte budget; dropped {dropped} of its frames")
+            thinned.append(window.index)
+        tasks.append(asyncio.create_task(run(window)))
+
+    results = await asyncio.gather(*tasks)
+    failed = [index for index, _, result in results if isinstance(result, Exception)]
+    if results and len(failed) == len(results):
+        raise results[0][2]
+    succeeded = [item for item in results if not isinstance(item[2], Exception)]
+    return merge_narrations(succeeded), failed, thinned
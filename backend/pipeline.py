@@ -0,0 +1,72 @@
+import asyncio
+import time
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+
+@dataclass
+class Stage:
+    """
+    One step of a pipeline. `func` is awaited with the results of the stages
+    named in `deps` as keyword arguments.
+    """
+    name: str
+    func: Callable[..., Awaitable[Any]]
+    deps: Tuple[str, ...] = ()
+
+
+def _check_graph(stages: List[Stage]):
+    names = {stage.name for stage in stages}
+    if len(names) != len(stages):
+        raise ValueError("Stage names must be unique")
+    for stage in stages:
+        missing = [dep for dep in stage.deps if dep not in names]
+        if missing:
+            raise ValueError(f"Stage '{stage.name}' depends on unknown stages {missing}")
+
+    deps = {stage.name: set(stage.deps) for stage in stages}
+    while deps:
+        ready = [name for name, pending in deps.items() if not pending]
+        if not ready:
+            raise ValueError(f"Stages {sorted(deps)} form a dependency cycle")
+        for name in ready:
+            del deps[name]
+        for pending in deps.values():
+            pending.difference_update(ready)
+
+
+async def run_stages(stages: List[Stage], report: Optional[Callable[..., None]] = None) -> Tuple[Dict[str, Any], Dict[str, float]]:
+    """
+    Run every stage as soon as its dependencies have finished, so independent
+    branches overlap. Returns the stage results and per-stage wall time in
+    seconds (plus the end-to-end "total"). If a stage fails, the stages still
+    running are cancelled and the error is raised.
+    """
+    _check_graph(stages)
+    tasks: Dict[str, asyncio.Task] = {}
+    timings: Dict[str, float] = {}
+    started = time.perf_counter()
+
+    async def run(stage: Stage):
+        kwargs = {dep: await tasks[dep] for dep in stage.deps}
+        if report is not None:
+            report(stage.name)
+        stage_started = time.perf_counter()
+        try:
+            return await stage.func(**kwargs)
+        finally:
+            timings[stage.name] = round(time.perf_counter() - stage_started, 3)
+
+    for stage in stages:
+        tasks[stage.name] = asyncio.ensure_future(run(stage))
+
+    try:
+        await asyncio.gather(*tasks.values())
+    except BaseException:
+        for task in tasks.values():
+            task.cancel()
+        await asyncio.gather(*tasks.values(), return_exceptions=True)
+        raise
+
+    timings["total"] = round(time.perf_counter() - started, 3)
+    return {name: task.result() for name, task in tasks.items()}, timings
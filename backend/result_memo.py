@@ -0,0 +1,117 @@
+import asyncio
+import hashlib
+import json
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Iterable, Optional, Tuple
+
+RESULT_CACHE_TTL_SECONDS = float(os.getenv("RESULT_CACHE_TTL_SECONDS", "3600"))
+RESULT_CACHE_MAX_ENTRIES = int(os.getenv("RESULT_CACHE_MAX_ENTRIES", "256"))
+
+
+def normalize_prompt(prompt: str) -> str:
+    return " ".join(prompt.lower().split())
+
+
+def generation_key(file_hashes: Iterable[str], prompt: str) -> str:
+    """Identity of a generation request: what was uploaded and what was asked."""
+    payload = json.dumps({"files": sorted(file_hashes), "prompt": normalize_prompt(prompt)}, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def generation_cacheable(result: Any) -> bool:
+    """
+    Whether a /generate-video/ result may be replayed: only complete
+    successes. Errors, placeholder videos and a missing summary/quiz all come
+    from transient failures that a retry may not hit.
+    """
+    return (
+        isinstance(result, dict)
+        and not result.get("placeholder_video")
+        and bool(result.get("video_url"))
+        and bool(result.get("main_content_url"))
+    )
+
+
+class ResultMemo:
+    """
+    Memoizes whole results by key and coalesces concurrent identical calls.
+
+    `run` returns a finished result if one is cached, attaches to the call
+    already computing the key if there is one (single-flight), and only
+    otherwise runs `func`. Only results `cacheable` accepts are kept, for
+    `ttl` seconds and at most `max_entries` of them, least recently used first
+    out.
+    """
+
+    def __init__(
+        self,
+        ttl: float = RESULT_CACHE_TTL_SECONDS,
+        max_entries: int = RESULT_CACHE_MAX_ENTRIES,
+        cacheable: Callable[[Any], bool] = lambda result: True,
+    ):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.cacheable = cacheable
+        self.hits = 0
+        self.coalesced = 0
+        self.misses = 0
+        self._results: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._in_flight: Dict[str, asyncio.Task] = {}
+
+    def get(self, key: str) -> Optional[Any]:
+        cached = self._results.get(key)
+        if cached is None:
+            return None
+        expires_at, result = cached
+        if expires_at <= time.time():
+            del self._results[key]
+            return None
+        self._results.move_to_end(key)
+        return result
+
+    async def run(self, key: str, func: Callable[[], Awaitable[Any]]) -> Tuple[Any, str]:
+        """
+        Returns the result and how it was obtained: "hit", "coalesced" or
+        "miss". `func` is only called on a miss, by the caller that computes
+        the key, and must return an awaitable.
+        """
+        result = self.get(key)
+        if result is not None:
+            self.hits += 1
+            return result, "hit"
+
+        task = self._in_flight.get(key)
+        if task is not None:
+            self.coalesced += 1
+            status = "coalesced"
+        else:
+            self.misses += 1
+            status = "miss"
+            # func() is called here, not inside the task, so the caller knows
+            # by the time run() suspends whether it started the computation.
+            task = asyncio.ensure_future(self._compute(key, func()))
+            self._in_flight[key] = task
+            task.add_done_callback(lambda _: self._in_flight.pop(key, None))
+        # Shielded so one caller going away does not cancel the others' result.
+        return await asyncio.shield(task), status
+
+    async def _compute(self, key: str, pending: Awaitable[Any]) -> Any:
+        result = await pending
+        if result is not None and self.cacheable(result):
+            self._results[key] = (time.time() + self.ttl, result)
+            self._results.move_to_end(key)
+            while len(self._results) > self.max_entries:
+                self._results.popitem(last=False)
+        return result
+
+    def stats(self) -> dict:
+        return {
+            "hits": self.hits,
+            "coalesced": self.coalesced,
+            "misses": self.misses,
+            "in_flight": len(self._in_flight),
+            "entries": len(self._results),
+            "max_entries": self.max_entries,
+        }
@@ -0,0 +1,32 @@
+from typing import List, Tuple
+
+import numpy as np
+from langchain_community.vectorstores import FAISS
+from langchain_core.documents import Document
+
+
+def search_with_vectors(vectorstore: FAISS, query_embedding, k: int = 10) -> Tuple[List[Document], np.ndarray]:
+    """
+    Nearest-neighbour search that also returns the stored vector of every hit,
+    so callers can score candidates without embedding them again.
+    """
+    index = vectorstore.index
+    query = np.asarray(query_embedding, dtype="float32").reshape(1, -1)
+    k = min(k, index.ntotal)
+    if k <= 0:
+        return [], np.empty((0, index.d), dtype="float32")
+
+    _, ids = index.search(query, k)
+    ids = np.array([i for i in ids[0] if i != -1], dtype="int64")
+    vectors = index.reconstruct_batch(ids)
+    docs = [vectorstore.docstore.search(vectorstore.index_to_docstore_id[int(i)]) for i in ids]
+    return docs, vectors
+
+
+def rerank(query_embedding, docs: List[Document], vectors: np.ndarray) -> List[Document]:
+    """Order candidates by dot product with the query in one matrix product."""
+    if not docs:
+        return []
+    scores = vectors @ np.asarray(query_embedding, dtype=vectors.dtype)
+    order = np.argsort(-scores, kind="stable")
+    return [docs[i] for i in order]
@@ -0,0 +1,282 @@
+import asyncio
+import json
+import os
+import re
+import shutil
+import uuid
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import Dict, List, Optional
+
+from langchain_community.vectorstores import FAISS
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_text_splitters import TextSplitter
+
+from executors import run_in_thread
+from ingestion import build_vectorstore
+
+SPACE_INDEX_DIR = os.getenv("SPACE_INDEX_DIR", "space_indexes")
+# Spaces kept loaded in memory; the rest are read back from disk on use.
+SPACE_INDEX_MAX_LOADED = int(os.getenv("SPACE_INDEX_MAX_LOADED", "16"))
+
+SPACE_ID_PATTERN = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+
+
+def check_space_id(space_id: str) -> str:
+    if not SPACE_ID_PATTERN.match(space_id):
+        raise ValueError(f"Invalid space id '{space_id}'")
+    return space_id
+
+
+class _SpaceLocks:
+    def __init__(self):
+        # Held for a whole add or remove, so updates to a space run one at a time.
+        self.update = asyncio.Lock()
+        # Held only while the loaded index is searched or swapped.
+        self.index = asyncio.Lock()
+        self.users = 0
+
+
+class SpaceIndexStore:
+    """
+    One persistent vector index per space, updated file by file.
+
+    Adding a file embeds only that file's chunks and merges them into the
+    space's index, and removing one deletes only its vectors, so a space is
+    never rebuilt. New files are parsed and embedded into a separate index
+    first; searches only wait for the merge. Every change writes a new
+    version of the space (the FAISS index plus a manifest of its files) to
+    its own directory, and a pointer file is then replaced to make it
+    current, so readers and crashes only ever see a whole version. Recently
+    used spaces stay loaded, so later prompts in a space search a warm index.
+
+    Space indexes stay flat: they are modified in place, which the compact
+    approximate index types do not support well.
+    """
+
+    def __init__(self, embeddings: Embeddings, splitter: TextSplitter, embedding_model: str, root: str = SPACE_INDEX_DIR, max_loaded: int = SPACE_INDEX_MAX_LOADED):
+        self.embeddings = embeddings
+        self.splitter = splitter
+        self.embedding_model = embedding_model
+        self.root = root
+        self.max_loaded = max_loaded
+        self._loaded: "OrderedDict[str, dict]" = OrderedDict()
+        self._locks: Dict[str, _SpaceLocks] = {}
+        os.makedirs(root, exist_ok=True)
+        self._recover()
+
+    def _path(self, space_id: str) -> str:
+        return os.path.join(self.root, check_space_id(space_id))
+
+    @staticmethod
+    def _current(path: str) -> Optional[str]:
+        """Directory of the space's current version, or None if it has none."""
+        try:
+            with open(os.path.join(path, "CURRENT"), encoding="utf-8") as f:
+                return os.path.join(path, f.read().strip())
+        except FileNotFoundError:
+            return None
+
+    def _prune(self, path: str):
+        """Remove every version but the current one, and any half-written pointer."""
+        current = self._current(path)
+        for name in os.listdir(path):
+            entry = os.path.join(path, name)
+            if name == "CURRENT" or entry == current:
+                continue
+            if os.path.isdir(entry):
+                shutil.rmtree(entry, ignore_errors=True)
+            else:
+                os.remove(entry)
+
+    def _recover(self):
+        # Versions written by a process that died before publishing them.
+        for name in os.listdir(self.root):
+            path = os.path.join(self.root, name)
+            if SPACE_ID_PATTERN.match(name) and os.path.isdir(path):
+                self._prune(path)
+
+    @asynccontextmanager
+    async def _locked(self, space_id: str, name: str):
+        # Lock entries only live while someone holds or waits for them.
+        locks = self._locks.get(space_id)
+        if locks is None:
+            locks = self._locks[space_id] = _SpaceLocks()
+        locks.users += 1
+        try:
+            async with getattr(locks, name):
+                yield
+        finally:
+            locks.users -= 1
+            if not locks.users and self._locks.get(space_id) is locks:
+                del self._locks[space_id]
+
+    def _read(self, space_id: str) -> dict:
+        path = self._current(self._path(space_id))
+        if path is None:
+            return {"files": {}, "vectorstore": None}
+        manifest_path = os.path.join(path, "manifest.json")
+        with open(manifest_path, encoding="utf-8") as f:
+            manifest = json.load(f)
+        if manifest["embedding_model"] != self.embedding_model:
+            raise ValueError(
+                f"Space {space_id} was indexed with {manifest['embedding_model']}; "
+                f"remove and re-add its files to use {self.embedding_model}"
+            )
+        vectorstore = None
+        if os.path.exists(os.path.join(path, "index.faiss")):
+            vectorstore = FAISS.load_local(path, self.embeddings, allow_dangerous_deserialization=True)
+        return {"files": manifest["files"], "vectorstore": vectorstore}
+
+    def _write(self, space_id: str, space: dict) -> str:
+        """Write `space` as a new, not yet current, version and return its name."""
+        version = f"v-{uuid.uuid4().hex}"
+        path = os.path.join(self._path(space_id), version)
+        os.makedirs(path)
+        try:
+            if space["vectorstore"] is not None:
+                space["vectorstore"].save_local(path)
+            with open(os.path.join(path, "manifest.json"), "w", encoding="utf-8") as f:
+                json.dump({"embedding_model": self.embedding_model, "files": space["files"]}, f, indent=2)
+        except BaseException:
+            shutil.rmtree(path, ignore_errors=True)
+            raise
+        return version
+
+    def _publish(self, space_id: str, version: str):
+        """Make `version` the space's current one; call with its index lock held."""
+        path = self._path(space_id)
+        pointer = os.path.join(path, f"CURRENT.tmp-{uuid.uuid4().hex}")
+        with open(pointer, "w", encoding="utf-8") as f:
+            f.write(version)
+        os.replace(pointer, os.path.join(path, "CURRENT"))
+        self._prune(path)
+
+    async def _get(self, space_id: str) -> dict:
+        """The loaded space; call with its index lock held."""
+        space = self._loaded.get(space_id)
+        if space is None:
+            space = await run_in_thread(self._read, space_id)
+            self._loaded[space_id] = space
+        self._loaded.move_to_end(space_id)
+        while len(self._loaded) > self.max_loaded:
+            self._loaded.popitem(last=False)
+        return space
+
+    async def _save(self, space_id: str, space: dict):
+        # Writing the new version only reads the index, which searches can do
+        # at the same time. Publishing it deletes the old version, which a
+        # concurrent _read may be loading, so that waits for the index lock.
+        try:
+            version = await run_in_thread(self._write, space_id, space)
+            async with self._locked(space_id, "index"):
+                await run_in_thread(self._publish, space_id, version)
+        except BaseException:
+            # Memory is ahead of the disk; the next use reloads the space from disk.
+            async with self._locked(space_id, "index"):
+                self._loaded.pop(space_id, None)
+            raise
+
+    async def files(self, space_id: str) -> List[dict]:
+        async with self._locked(space_id, "index"):
+            space = await self._get(space_id)
+            return [{"file_hash": file_hash, **info} for file_hash, info in space["files"].items()]
+
+    async def file_hashes(self, space_id: str) -> List[str]:
+        return sorted(file["file_hash"] for file in await self.files(space_id))
+
+    async def add_files(self, space_id: str, file_paths: List[str], file_hashes: List[str], names: Optional[List[str]] = None) -> dict:
+        """Index the files the space does not have yet. Returns which hashes were added and skipped."""
+        names = names or [os.path.basename(file_path) for file_path in file_paths]
+        async with self._locked(space_id, "update"):
+            async with self._locked(space_id, "index"):
+                known = set((await self._get(space_id))["files"])
+            new = {}
+            new_names = {}
+            for file_path, file_hash, name in zip(file_paths, file_hashes, names):
+                if file_hash not in known and file_hash not in new:
+                    new[file_hash] = file_path
+                    new_names[file_hash] = name
+            if not new:
+                return {"added": [], "skipped": list(file_hashes)}
+
+            hash_by_path = {file_path: file_hash for file_hash, file_path in new.items()}
+            chunk_counts = {file_hash: 0 for file_hash in new}
+
+            def chunk_id(chunk: Document) -> str:
+                file_hash = hash_by_path[chunk.metadata["source"]]
+                chunk_counts[file_hash] += 1
+                return f"{file_hash}:{chunk_counts[file_hash] - 1}"
+
+            def metadata(chunk: Document) -> dict:
+                # The upload path is temporary; keep what identifies the file instead.
+                file_hash = hash_by_path[chunk.metadata["source"]]
+                return {**chunk.metadata, "source": new_names[file_hash], "file_hash": file_hash}
+
+            # Parsed and embedded into an index of their own while searches
+            # go on; only the merge below makes them wait.
+            added = await build_vectorstore(
+                list(new.values()), self.embeddings, self.splitter,
+                chunk_id=chunk_id, metadata=metadata,
+            )
+            async with self._locked(space_id, "index"):
+                space = await self._get(space_id)
+                if space["vectorstore"] is None:
+                    space["vectorstore"] = added
+                else:
+                    await run_in_thread(space["vectorstore"].merge_from, added)
+                space["files"] = {
+                    **space["files"],
+                    **{file_hash: {"name": new_names[file_hash], "chunks": chunk_counts[file_hash]} for file_hash in new},
+                }
+            await self._save(space_id, space)
+            return {"added": list(new), "skipped": [h for h in file_hashes if h not in new]}
+
+    async def remove_file(self, space_id: str, file_hash: str) -> bool:
+        """Delete one file's vectors from the space. False if the space does not have it."""
+        async with self._locked(space_id, "update"):
+            async with self._locked(space_id, "index"):
+                space = await self._get(space_id)
+                info = space["files"].get(file_hash)
+                if info is None:
+                    return False
+                if info["chunks"]:
+                    ids = [f"{file_hash}:{i}" for i in range(info["chunks"])]
+                    await run_in_thread(space["vectorstore"].delete, ids)
+                space["files"] = {h: f for h, f in space["files"].items() if h != file_hash}
+                if space["vectorstore"] is not None and space["vectorstore"].index.ntotal == 0:
+                    space["vectorstore"] = None
+            await self._save(space_id, space)
+            return True
+
+    async def delete(self, space_id: str):
+        path = self._path(space_id)
+        async with self._locked(space_id, "update"):
+            async with self._locked(space_id, "index"):
+                self._loaded.pop(space_id, None)
+                # Without its pointer the space reads as empty, however far
+                # the removal below gets.
+                try:
+                    os.remove(os.path.join(path, "CURRENT"))
+                except FileNotFoundError:
+                    pass
+            await run_in_thread(shutil.rmtree, path, ignore_errors=True)
+
+    async def use(self, space_id: str, func, *args):
+        """
+        Run `func(vectorstore, *args)` on the thread pool while the index
+        cannot change. Returns None if the space has no vectors.
+        """
+        async with self._locked(space_id, "index"):
+            space = await self._get(space_id)
+            if space["vectorstore"] is None:
+                return None
+            return await run_in_thread(func, space["vectorstore"], *args)
+
+    def stats(self) -> dict:
+        return {
+            "loaded": len(self._loaded),
+            "max_loaded": self.max_loaded,
+            "spaces": sum(1 for name in os.listdir(self.root) if SPACE_ID_PATTERN.match(name)),
+        }
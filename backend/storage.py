@@ -0,0 +1,185 @@
+import base64
+import os
+from typing import AsyncIterator, Optional
+
+import httpx
+
+from executors import run_in_thread
+
+STORAGE_TRANSFER_CHUNK_BYTES = int(os.getenv("STORAGE_TRANSFER_CHUNK_BYTES", str(1024 * 1024)))
+# Supabase's resumable (TUS) endpoint requires every chunk but the last to be exactly 6 MB.
+STORAGE_RESUMABLE_CHUNK_BYTES = 6 * 1024 * 1024
+STORAGE_RESUMABLE_THRESHOLD_MB = int(os.getenv("STORAGE_RESUMABLE_THRESHOLD_MB", "50"))
+STORAGE_RESUMABLE_RETRIES = int(os.getenv("STORAGE_RESUMABLE_RETRIES", "3"))
+
+
+async def _rechunk(chunks: AsyncIterator[bytes], size: int) -> AsyncIterator[bytes]:
+    buffer = bytearray()
+    async for chunk in chunks:
+        buffer.extend(chunk)
+        while len(buffer) >= size:
+            yield bytes(buffer[:size])
+            del buffer[:size]
+    if buffer:
+        yield bytes(buffer)
+
+
+class SupabaseStorage:
+    """
+    Streaming uploads to a Supabase storage bucket over its REST API.
+
+    The supabase-py client only uploads from a path or an in-memory buffer, so
+    transfers from a remote URL go straight from the download stream into the
+    upload request instead of through a temporary file.
+    """
+
+    def __init__(self, url: str, key: str, bucket: str = "videos"):
+        self.url = (url or "").rstrip("/")
+        self.key = key or ""
+        self.bucket = bucket
+
+    def _headers(self, **extra) -> dict:
+        return {"Authorization": f"Bearer {self.key}", "apikey": self.key, **extra}
+
+    def public_url(self, storage_path: str) -> str:
+        return f"{self.url}/storage/v1/object/public/{self.bucket}/{storage_path}"
+
+    async def upload_stream(
+        self,
+        http: httpx.AsyncClient,
+        storage_path: str,
+        chunks: AsyncIterator[bytes],
+        content_type: str = "application/octet-stream",
+        content_length: Optional[int] = None,
+    ) -> str:
+        headers = self._headers(**{"Content-Type": content_type})
+        if content_length is not None:
+            headers["Content-Length"] = str(content_length)
+        response = await http.post(
+            f"{self.url}/storage/v1/object/{self.bucket}/{storage_path}",
+            headers=headers,
+            content=chunks,
+        )
+        if response.status_code >= 400:
+            raise Exception(f"Upload failed with status {response.status_code}: {response.text}")
+        return self.public_url(storage_path)
+
+    async def upload_file(
+        self,
+        http: httpx.AsyncClient,
+        storage_path: str,
+        local_path: str,
+        content_type: str = "application/octet-stream",
+    ) -> str:
+        """Upload a local file, read in STORAGE_TRANSFER_CHUNK_BYTES pieces off the event loop."""
+        async def chunks():
+            with open(local_path, "rb") as f:
+                while True:
+                    chunk = await run_in_thread(f.read, STORAGE_TRANSFER_CHUNK_BYTES)
+                    if not chunk:
+                        return
+                    yield chunk
+
+        return await self.upload_stream(
+            http, storage_path, chunks(), content_type=content_type,
+            content_length=os.path.getsize(local_path),
+        )
+
+    async def upload_resumable(
+        self,
+        http: httpx.AsyncClient,
+        storage_path: str,
+        chunks: AsyncIterator[bytes],
+        content_length: int,
+        content_type: str = "application/octet-stream",
+    ) -> str:
+        """
+        Upload through the TUS endpoint in 6 MB pieces. A failed piece is
+        retried from the offset the server reports, so a dropped connection
+        only costs the piece in flight.
+        """
+        def encode(value: str) -> str:
+            return base64.b64encode(value.encode("utf-8")).decode("ascii")
+
+        response = await http.post(
+            f"{self.url}/storage/v1/upload/resumable",
+            headers=self._headers(**{
+                "Tus-Resumable": "1.0.0",
+                "Upload-Length": str(content_length),
+                "Upload-Metadata": ",".join([
+                    f"bucketName {encode(self.bucket)}",
+                    f"objectName {encode(storage_path)}",
+                    f"contentType {encode(content_type)}",
+                ]),
+            }),
+        )
+        if response.status_code != 201:
+            raise Exception(f"Resumable upload could not be created ({response.status_code}): {response.text}")
+        location = response.headers["Location"]
+
+        offset = 0
+        async for piece in _rechunk(chunks, STORAGE_RESUMABLE_CHUNK_BYTES):
+            piece_start = offset
+            piece_end = piece_start + len(piece)
+            failures = 0
+            # The server may accept only part of a PATCH; keep sending the
+            # rest of the piece until its offset reaches the end of it.
+            while offset < piece_end:
+                try:
+                    response = await http.patch(
+                        location,
+                        headers=self._headers(**{
+                            "Tus-Resumable": "1.0.0",
+                            "Upload-Offset": str(offset),
+                            "Content-Type": "application/offset+octet-stream",
+                        }),
+                        content=piece[offset - piece_start:],
+                    )
+                    if response.status_code == 204:
+                        accepted = int(response.headers.get("Upload-Offset", piece_end))
+                        if accepted > offset:
+                            offset = self._check_offset(accepted, piece_start, piece_end)
+                            continue
+                        error = Exception(f"Chunk upload made no progress at offset {offset}")
+                    else:
+                        error = Exception(f"Chunk upload failed with status {response.status_code}: {response.text}")
+                except httpx.TransportError as e:
+                    error = e
+                failures += 1
+                if failures > STORAGE_RESUMABLE_RETRIES:
+                    raise error
+                head = await http.head(location, headers=self._headers(**{"Tus-Resumable": "1.0.0"}))
+                offset = self._check_offset(int(head.headers.get("Upload-Offset", offset)), piece_start, piece_end)
+        return self.public_url(storage_path)
+
+    @staticmethod
+    def _check_offset(offset: int, piece_start: int, piece_end: int) -> int:
+        # Only the current piece is still in memory, so the server has to be somewhere inside it.
+        if not piece_start <= offset <= piece_end:
+            raise Exception(f"Server upload offset {offset} is outside the current piece [{piece_start}, {piece_end}]")
+        return offset
+
+    async def transfer_url(
+        self,
+        http: httpx.AsyncClient,
+        source_url: str,
+        storage_path: str,
+        resumable: Optional[bool] = None,
+    ) -> str:
+        """
+        Pipe `source_url` into the bucket without touching the disk. Large
+        files with a known length go through the resumable endpoint unless
+        `resumable` says otherwise.
+        """
+        async with http.stream("GET", source_url, follow_redirects=True) as response:
+            response.raise_for_status()
+            content_type = response.headers.get("Content-Type", "video/mp4")
+            length = response.headers.get("Content-Length")
+            content_length = int(length) if length and "Content-Encoding" not in response.headers else None
+            chunks = response.aiter_bytes(chunk_size=STORAGE_TRANSFER_CHUNK_BYTES)
+
+            if resumable is None:
+                resumable = content_length is not None and content_length >= STORAGE_RESUMABLE_THRESHOLD_MB * 1024 * 1024
+            if resumable and content_length is not None:
+                return await self.upload_resumable(http, storage_path, chunks, content_length, content_type)
+            return await self.upload_stream(http, storage_path, chunks, content_type, content_length)
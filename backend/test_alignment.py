@@ -0,0 +1,49 @@
+import pytest
+
+from alignment import build_time_map, segment_filter, segment_inputs
+
+
+def spans(segments):
+    return [(round(s.source_start, 3), round(s.source_end, 3), round(s.duration, 3)) for s in segments]
+
+
+def test_lines_that_fit_play_in_real_time():
+    segments = build_time_map([(2.0, 2.0, 1.0), (6.0, 6.0, 1.5)], video_duration=10.0)
+    assert spans(segments) == [(0.0, 10.0, 10.0)]
+    assert segments[0].speed == pytest.approx(1.0)
+
+
+def test_long_line_slows_its_segment_and_later_lines_stay_on_their_frames():
+    # The first line runs 2s past the next cue, so the 4s between the cues
+    # must cover 6s of narration; the rest of the video plays normally.
+    segments = build_time_map([(2.0, 2.0, 6.0), (6.0, 8.0, 1.0)], video_duration=10.0)
+    assert spans(segments) == [(0.0, 2.0, 2.0), (2.0, 6.0, 6.0), (6.0, 10.0, 4.0)]
+    assert segments[1].speed == pytest.approx(4.0 / 6.0)
+    assert sum(s.duration for s in segments) == pytest.approx(12.0)
+
+
+def test_slowdown_is_capped_and_the_rest_is_held():
+    segments = build_time_map([(0.0, 0.0, 5.0), (1.0, 5.0, 1.0)], video_duration=3.0, max_slowdown=2.0)
+    first = segments[0]
+    assert (first.source_start, first.source_end, first.duration) == (0.0, 1.0, 5.0)
+    assert first.speed == pytest.approx(0.5)
+    assert first.pad == pytest.approx(3.0)
+
+
+def test_last_line_past_the_end_stretches_the_tail():
+    segments = build_time_map([(9.0, 9.0, 3.0)], video_duration=10.0, max_slowdown=10.0)
+    assert spans(segments)[-1] == (9.0, 10.0, 3.0)
+
+
+def test_cues_at_the_same_frame_hold_it():
+    segments = build_time_map([(4.0, 4.0, 2.0), (4.0, 6.0, 2.0)], video_duration=10.0, max_slowdown=1.0)
+    assert sum(s.duration for s in segments) == pytest.approx(10.0 + 2.0)
+    assert sum(s.pad for s in segments) == pytest.approx(2.0)
+
+
+def test_filter_graph_has_one_chain_per_segment():
+    segments = build_time_map([(2.0, 2.0, 6.0), (6.0, 8.0, 1.0)], video_duration=10.0)
+    graph = segment_filter(segments)
+    assert graph.count("setpts=") == 3
+    assert graph.endswith("[v0][v1][v2]concat=n=3:v=1:a=0[v]")
+    assert segment_inputs("in.mp4", segments).count("-i") == 3
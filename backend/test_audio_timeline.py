@@ -0,0 +1,53 @@
+import numpy as np
+import pytest
+
+from audio_timeline import AudioTimeline
+
+
+def pcm(value, samples):
+    return np.full(samples, value, dtype=np.int16).tobytes()
+
+
+def test_clips_land_at_their_timestamps_with_silence_between():
+    timeline = AudioTimeline(sample_rate=10)
+    assert timeline.add(0.5, pcm(1, 3)) == 0.5
+    assert timeline.add(1.0, pcm(2, 2)) == 1.0
+    track = timeline.render()[:, 0]
+    assert track.tolist() == [0, 0, 0, 0, 0, 1, 1, 1, 0, 0, 2, 2]
+    assert timeline.duration == pytest.approx(1.2)
+
+
+def test_overlapping_clip_waits_for_the_previous_one():
+    timeline = AudioTimeline(sample_rate=10)
+    timeline.add(0.0, pcm(1, 5))
+    assert timeline.add(0.2, pcm(2, 2)) == 0.5
+    assert timeline.render()[:, 0].tolist() == [1, 1, 1, 1, 1, 2, 2]
+
+
+def test_matches_segment_concatenation():
+    from pydub import AudioSegment
+
+    rate = 24000
+    rng = np.random.default_rng(0)
+    clips = [(0.3, rng.integers(-1000, 1000, 4800, dtype=np.int16).tobytes()),
+             (0.4, rng.integers(-1000, 1000, 2400, dtype=np.int16).tobytes()),
+             (1.5, rng.integers(-1000, 1000, 1200, dtype=np.int16).tobytes())]
+
+    expected = AudioSegment.empty()
+    last = 0.0
+    for timestamp, data in clips:
+        if timestamp > last:
+            expected += AudioSegment.silent(duration=(timestamp - last) * 1000, frame_rate=rate)
+        segment = AudioSegment(data=data, sample_width=2, frame_rate=rate, channels=1)
+        expected += segment
+        last = max(timestamp, last) + len(data) / 2 / rate
+
+    timeline = AudioTimeline(sample_rate=rate)
+    for timestamp, data in clips:
+        timeline.add(timestamp, data)
+    assert timeline.to_bytes() == expected.raw_data
+
+
+def test_rejects_truncated_pcm():
+    with pytest.raises(ValueError):
+        AudioTimeline(sample_rate=24000).add(0, b"\x00\x01\x02")
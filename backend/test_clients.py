@@ -0,0 +1,50 @@
+import asyncio
+
+import pytest
+
+from clients import ClientRegistry
+
+
+@pytest.fixture(autouse=True)
+def api_keys(monkeypatch):
+    for name in ("ANTHROPIC_API_KEY", "OPENAI_API_KEY", "ELEVENLABS_API_KEY"):
+        monkeypatch.setenv(name, "test-key")
+
+
+def test_clients_are_created_on_first_use_and_reused():
+    registry = ClientRegistry()
+    assert registry._pools == []
+
+    http = registry.http
+    assert registry.http is http
+    assert len(registry._pools) == 1
+
+    anthropic = registry.anthropic
+    assert registry.anthropic is anthropic
+    assert registry.openai is registry.openai
+    assert registry.elevenlabs is registry.elevenlabs
+    # One keep-alive pool per service, none shared and none duplicated.
+    assert len(registry._pools) == 4
+    asyncio.run(registry.close())
+
+
+def test_start_creates_every_client_up_front():
+    registry = ClientRegistry()
+    registry.start()
+    assert len(registry._pools) == 4
+    asyncio.run(registry.close())
+
+
+def test_close_releases_pools_and_later_use_reconnects():
+    registry = ClientRegistry()
+    registry.start()
+    pools = list(registry._pools)
+    http = registry.http
+
+    asyncio.run(registry.close())
+    assert all(pool.is_closed for pool in pools)
+    assert registry._pools == []
+
+    assert registry.http is not http
+    assert not registry.http.is_closed
+    asyncio.run(registry.close())
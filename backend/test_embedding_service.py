@@ -0,0 +1,71 @@
+import threading
+
+import pytest
+
+from embedding_service import EmbeddingService
+
+
+class FakeModel:
+    def __init__(self):
+        self.calls = []
+
+    def embed_documents(self, texts):
+        self.calls.append(list(texts))
+        return [[float(len(text))] for text in texts]
+
+
+def test_results_match_inputs():
+    service = EmbeddingService(model=FakeModel(), max_batch_size=4, max_wait_ms=1)
+    try:
+        assert service.embed_documents(["a", "bb", "ccc"]) == [[1.0], [2.0], [3.0]]
+        assert service.embed_query("dddd") == [4.0]
+        assert service.embed_documents([]) == []
+    finally:
+        service.stop()
+
+
+def test_concurrent_calls_share_a_batch():
+    model = FakeModel()
+    service = EmbeddingService(model=model, max_batch_size=64, max_wait_ms=200)
+    service.start()
+    results = {}
+
+    def worker(i):
+        results[i] = service.embed_documents(["x" * i])
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(1, 9)]
+    try:
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        service.stop()
+
+    assert results == {i: [[float(i)]] for i in range(1, 9)}
+    assert len(model.calls) < 8
+
+
+def test_large_calls_are_split_by_max_batch_size():
+    model = FakeModel()
+    service = EmbeddingService(model=model, max_batch_size=3, max_wait_ms=0)
+    try:
+        vectors = service.embed_documents(["a"] * 7)
+    finally:
+        service.stop()
+
+    assert len(vectors) == 7
+    assert [len(call) for call in model.calls] == [3, 3, 1]
+
+
+def test_model_errors_propagate_to_callers():
+    class BrokenModel:
+        def embed_documents(self, texts):
+            raise RuntimeError("boom")
+
+    service = EmbeddingService(model=BrokenModel(), max_wait_ms=0)
+    try:
+        with pytest.raises(RuntimeError, match="boom"):
+            service.embed_query("a")
+    finally:
+        service.stop()
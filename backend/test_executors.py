@@ -0,0 +1,42 @@
+import asyncio
+import os
+import time
+
+import executors
+
+
+def test_blocking_calls_do_not_freeze_the_event_loop():
+    async def main():
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                ticks += 1
+                await asyncio.sleep(0.01)
+
+        task = asyncio.create_task(ticker())
+        await executors.run_in_thread(time.sleep, 0.2)
+        task.cancel()
+        return ticks
+
+    try:
+        assert asyncio.run(main()) > 5
+    finally:
+        executors.shutdown_pools()
+
+
+def test_run_in_process_returns_result():
+    try:
+        assert asyncio.run(executors.run_in_process(pow, 2, 10)) == 1024
+    finally:
+        executors.shutdown_pools()
+
+
+def test_process_workers_are_not_forked_from_the_server():
+    try:
+        pool = executors.get_process_pool()
+        assert pool._mp_context.get_start_method() != "fork"
+        assert asyncio.run(executors.run_in_process(os.getpid)) != os.getpid()
+    finally:
+        executors.shutdown_pools()
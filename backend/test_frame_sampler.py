@@ -0,0 +1,81 @@
+import base64
+
+import cv2
+import numpy as np
+import pytest
+
+import frame_sampler
+from frame_sampler import encode_frames, sample_frames
+
+
+@pytest.fixture(scope="module")
+def video_path(tmp_path_factory):
+    # 10 s at 10 fps: dark for the first 4 s, then bright, then dark again from 7 s.
+    path = str(tmp_path_factory.mktemp("video") / "clip.mp4")
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"mp4v"), 10, (64, 48))
+    for i in range(100):
+        level = 200 if 40 <= i < 70 else 20
+        frame = np.full((48, 64, 3), level, dtype=np.uint8)
+        cv2.putText(frame, str(i), (5, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (level // 2,) * 3)
+        writer.write(frame)
+    writer.release()
+    return path
+
+
+@pytest.mark.parametrize("strategy", ["sequential", "seek"])
+def test_grid_strategies_sample_every_interval(video_path, strategy):
+    timestamps = [t for t, _ in sample_frames(video_path, seconds_per_frame=2, strategy=strategy)]
+    assert timestamps == pytest.approx([0, 2, 4, 6, 8])
+
+
+def test_sequential_and_seek_return_the_same_frames(video_path):
+    sequential = [frame for _, frame in sample_frames(video_path, seconds_per_frame=3, strategy="sequential")]
+    seek = [frame for _, frame in sample_frames(video_path, seconds_per_frame=3, strategy="seek")]
+    assert len(sequential) == len(seek)
+    for a, b in zip(sequential, seek):
+        assert np.abs(a.astype(int) - b.astype(int)).mean() < 2
+
+
+def test_keyframe_strategy_stays_on_the_grid(video_path):
+    timestamps = [t for t, _ in sample_frames(video_path, seconds_per_frame=2, strategy="keyframe")]
+    assert timestamps[0] == 0
+    # At most one keyframe per grid slot.
+    slots = [int(t // 2) for t in timestamps]
+    assert slots == sorted(set(slots))
+    assert len(timestamps) >= 4
+
+
+def test_auto_falls_back_to_frame_gap_without_gop(video_path, monkeypatch):
+    monkeypatch.setattr(frame_sampler, "probe_gop_length", lambda path: None)
+    assert frame_sampler.choose_strategy(video_path, 10) == "sequential"
+    assert frame_sampler.choose_strategy(video_path, 10_000) == "seek"
+
+
+def test_auto_uses_gop_length(video_path, monkeypatch):
+    monkeypatch.setattr(frame_sampler, "probe_gop_length", lambda path: 12.0)
+    assert frame_sampler.choose_strategy(video_path, 20) == "keyframe"
+    assert frame_sampler.choose_strategy(video_path, 8) == "seek"
+    assert frame_sampler.choose_strategy(video_path, 4) == "sequential"
+
+
+def test_scene_detection_spends_frames_on_changes(video_path):
+    timestamps = [
+        t for t, _ in sample_frames(
+            video_path, seconds_per_frame=2, strategy="sequential",
+            scene_threshold=0.5, scene_check_seconds=0.5, max_gap_seconds=100,
+        )
+    ]
+    assert timestamps == pytest.approx([0, 4, 7])
+
+
+def test_unknown_strategy_is_rejected(video_path):
+    with pytest.raises(ValueError):
+        list(sample_frames(video_path, strategy="bogus"))
+
+
+def test_encoded_frames_are_downscaled(video_path):
+    frames = sample_frames(video_path, seconds_per_frame=5, strategy="sequential")
+    encoded = list(encode_frames(frames, max_side=32, jpeg_quality=50))
+    assert [t for t, _ in encoded] == pytest.approx([0, 5])
+    image = cv2.imdecode(np.frombuffer(base64.b64decode(encoded[0][1]), np.uint8), cv2.IMREAD_COLOR)
+    assert max(image.shape[:2]) == 32
@@ -0,0 +1,74 @@
+import os
+
+from langchain_community.vectorstores import FAISS
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+from disk_cache import DiskLRUCache
+from index_cache import IndexCache, index_cache_key
+
+
+def test_key_ignores_upload_order_but_not_settings():
+    key = index_cache_key(["b.pdf", "a.txt"], 1000, 200, "all-MiniLM-L6-v2")
+    assert key == index_cache_key(["a.txt", "b.pdf"], 1000, 200, "all-MiniLM-L6-v2")
+    assert key != index_cache_key(["a.txt", "b.pdf"], 500, 200, "all-MiniLM-L6-v2")
+    assert key != index_cache_key(["a.txt", "b.pdf"], 1000, 200, "other-model")
+
+
+def test_saved_index_is_loaded_on_repeat(tmp_path):
+    embeddings = DeterministicFakeEmbedding(size=8)
+    cache = IndexCache(root=str(tmp_path), max_bytes=10 * 1024 * 1024)
+
+    assert cache.load("abc", embeddings) is None
+    vectorstore = FAISS.from_texts(["alpha", "beta", "gamma"], embeddings)
+    cache.save("abc", vectorstore)
+
+    loaded = cache.load("abc", embeddings)
+    assert loaded is not None
+    assert loaded.index.ntotal == 3
+    assert loaded.similarity_search("beta", k=1)[0].page_content == "beta"
+
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["entries"]) == (1, 1, 1)
+
+
+def test_unreadable_entry_counts_as_miss(tmp_path):
+    cache = IndexCache(root=str(tmp_path), max_bytes=1024 * 1024)
+    os.makedirs(tmp_path / "broken")
+    assert cache.load("broken", DeterministicFakeEmbedding(size=8)) is None
+    assert not os.path.exists(tmp_path / "broken")
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["entries"]) == (0, 1, 0)
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    cache = DiskLRUCache(str(tmp_path), max_bytes=250)
+
+    def writer(path):
+        with open(path, "wb") as f:
+            f.write(b"x" * 100)
+
+    cache.put("a", writer)
+    cache.put("b", writer)
+    os.utime(tmp_path / "a", (1, 1))
+    os.utime(tmp_path / "b", (2, 2))
+    cache.get("a")
+    cache.put("c", writer)
+
+    assert sorted(os.listdir(tmp_path)) == ["a", "c"]
+    assert cache.stats()["evictions"] == 1
+
+
+def test_sizes_are_tracked_without_rescanning(tmp_path):
+    def writer(path):
+        with open(path, "wb") as f:
+            f.write(b"x" * 100)
+
+    with open(tmp_path / "old", "wb") as f:
+        f.write(b"x" * 50)
+    cache = DiskLRUCache(str(tmp_path), max_bytes=1000)
+    cache.put("a", writer)
+    assert (cache.stats()["entries"], cache.stats()["bytes"]) == (2, 150)
+
+    cache.discard("old")
+    cache.put("a", writer)
+    assert (cache.stats()["entries"], cache.stats()["bytes"]) == (1, 100)
@@ -0,0 +1,69 @@
+import asyncio
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+from ingestion import build_vectorstore, iter_documents
+
+
+class RecordingEmbeddings(Embeddings):
+    def __init__(self):
+        self.batches = []
+
+    def embed_documents(self, texts):
+        self.batches.append(len(texts))
+        return [self._vector(text) for text in texts]
+
+    def embed_query(self, text):
+        return self._vector(text)
+
+    def _vector(self, text):
+        rng = np.random.default_rng(abs(hash(text)) % (2 ** 32))
+        return rng.standard_normal(8).astype("float32").tolist()
+
+
+def write_files(tmp_path, count):
+    paths = []
+    for i in range(count):
+        path = tmp_path / f"{i}_notes.txt"
+        path.write_text(" ".join(f"file{i}-word{j}" for j in range(200)))
+        paths.append(str(path))
+    return paths
+
+
+def test_documents_arrive_in_file_order(tmp_path):
+    paths = write_files(tmp_path, 4) + [str(tmp_path / "slides.pptx")]
+
+    async def main():
+        return [doc async for doc in iter_documents(paths, max_pending=2)]
+
+    docs = asyncio.run(main())
+    assert [doc.metadata["source"] for doc in docs] == paths[:4]
+
+
+def test_chunks_are_embedded_in_fixed_batches(tmp_path):
+    paths = write_files(tmp_path, 3)
+    splitter = RecursiveCharacterTextSplitter(chunk_size=200, chunk_overlap=20)
+    embeddings = RecordingEmbeddings()
+
+    vectorstore = asyncio.run(build_vectorstore(paths, embeddings, splitter, batch_size=10))
+
+    expected = []
+    for path in paths:
+        expected += splitter.split_text(open(path).read())
+    assert vectorstore.index.ntotal == len(expected)
+    assert all(size == 10 for size in embeddings.batches[:-1])
+    assert sum(embeddings.batches) == len(expected)
+    stored = [vectorstore.docstore.search(vectorstore.index_to_docstore_id[i]).page_content for i in range(len(expected))]
+    assert stored == expected
+
+
+def test_no_text_is_an_error(tmp_path):
+    splitter = RecursiveCharacterTextSplitter(chunk_size=200, chunk_overlap=20)
+    try:
+        asyncio.run(build_vectorstore([str(tmp_path / "image.png")], RecordingEmbeddings(), splitter))
+    except ValueError as e:
+        assert "No text" in str(e)
+    else:
+        raise AssertionError("expected ValueError")
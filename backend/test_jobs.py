@@ -0,0 +1,94 @@
+import asyncio
+
+import pytest
+
+from jobs import JobManager, QueueFullError
+
+
+def test_job_reports_stages_and_result():
+    async def main():
+        manager = JobManager(workers=1, max_queue=4)
+        await manager.start()
+
+        async def work(report):
+            report("indexing")
+            await asyncio.sleep(0)
+            report("uploading", url="x")
+            return {"video_url": "https://example.com/v.mp4"}
+
+        job = manager.submit("test", work)
+        events = [event async for event in manager.events(job.id)]
+        await manager.stop()
+        return job, events
+
+    job, events = asyncio.run(main())
+    assert job.status == "succeeded"
+    assert job.result == {"video_url": "https://example.com/v.mp4"}
+    assert [event["event"] for event in events] == ["queued", "running", "stage", "stage", "succeeded"]
+    assert events[3]["url"] == "x"
+
+
+def test_failures_and_cleanup():
+    cleaned = []
+
+    async def main():
+        manager = JobManager(workers=1, max_queue=4)
+        await manager.start()
+
+        async def work(report):
+            raise ValueError("kodisc down")
+
+        job = manager.submit("test", work, cleanup=lambda: cleaned.append(True))
+        [event async for event in manager.events(job.id)]
+        await manager.stop()
+        return job
+
+    job = asyncio.run(main())
+    assert job.status == "failed"
+    assert job.error == "kodisc down"
+    assert cleaned == [True]
+
+
+def test_full_queue_pushes_back():
+    async def main():
+        manager = JobManager(workers=1, max_queue=1)
+        await manager.start()
+        release = asyncio.Event()
+
+        async def work(report):
+            await release.wait()
+
+        manager.submit("test", work)
+        await asyncio.sleep(0)  # let the worker pick up the first job
+        manager.submit("test", work)
+        try:
+            with pytest.raises(QueueFullError):
+                manager.submit("test", work)
+        finally:
+            release.set()
+            await manager.stop()
+
+    asyncio.run(main())
+
+
+def test_stop_fails_queued_jobs_and_cleans_them_up():
+    cleaned = []
+
+    async def main():
+        manager = JobManager(workers=1, max_queue=4)
+        await manager.start()
+
+        async def work(report):
+            await asyncio.Event().wait()
+
+        running = manager.submit("test", work, cleanup=lambda: cleaned.append("running"))
+        await asyncio.sleep(0)  # let the worker pick up the first job
+        queued = manager.submit("test", work, cleanup=lambda: cleaned.append("queued"))
+        await manager.stop()
+        return running, queued
+
+    running, queued = asyncio.run(main())
+    assert (running.status, running.error) == ("failed", "cancelled")
+    assert (queued.status, queued.error) == ("failed", "cancelled")
+    assert queued.events[-1]["event"] == "failed"
+    assert sorted(cleaned) == ["queued", "running"]
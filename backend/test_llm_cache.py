@@ -0,0 +1,48 @@
+import time
+
+from llm_cache import LLMCache, llm_cache_key
+
+
+def test_exact_key_covers_model_and_every_part():
+    key = llm_cache_key("model", "prompt", ["ctx"])
+    assert key == llm_cache_key("model", "prompt", ["ctx"])
+    assert key != llm_cache_key("other", "prompt", ["ctx"])
+    assert key != llm_cache_key("model", "prompt", ["ctx2"])
+
+
+def test_exact_hit():
+    cache = LLMCache()
+    cache.put("k", {"summary": "s"})
+    assert cache.get("k") == {"summary": "s"}
+    assert cache.stats()["exact_hits"] == 1
+
+
+def test_similar_prompt_in_the_same_scope_hits():
+    cache = LLMCache(similarity=0.95)
+    cache.put("k1", "answer", scope="docs-a", embedding=[1.0, 0.0, 0.0])
+    assert cache.get("k2", scope="docs-a", embedding=[0.99, 0.05, 0.0]) == "answer"
+    assert cache.get("k3", scope="docs-a", embedding=[0.0, 1.0, 0.0]) is None
+    assert cache.get("k4", scope="docs-b", embedding=[1.0, 0.0, 0.0]) is None
+    stats = cache.stats()
+    assert (stats["semantic_hits"], stats["misses"]) == (1, 2)
+
+
+def test_entries_expire():
+    cache = LLMCache(ttl=0.05)
+    cache.put("k", "v", scope="s", embedding=[1.0, 0.0])
+    time.sleep(0.1)
+    assert cache.get("k") is None
+    assert cache.get("other", scope="s", embedding=[1.0, 0.0]) is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = LLMCache(max_entries=2)
+    cache.put("a", 1, scope="s", embedding=[1.0, 0.0])
+    cache.put("b", 2)
+    cache.get("a")
+    cache.put("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    assert cache.stats()["evictions"] == 1
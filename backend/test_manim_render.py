@@ -0,0 +1,233 @@
+import asyncio
+import sys
+import textwrap
+
+import pytest
+
+from jobs import QueueFullError
+from manim_render import ManimRenderFarm, RenderError, limited_command, render_cache_key, scene_names
+
+# Stands in for the manim CLI: writes the source and flags into the video it
+# "renders" and logs each invocation. Sources containing SLEEP take a while.
+FAKE_MANIM = textwrap.dedent("""
+    import os, sys, time
+    args = sys.argv[1:]
+    media_dir = args[args.index("--media_dir") + 1]
+    output = args[args.index("-o") + 1]
+    script, scene = args[-2], args[-1]
+    source = open(script).read()
+    with open(os.environ["FAKE_MANIM_LOG"], "a") as log:
+        log.write(scene + "\\n")
+    if "SLEEP" in source:
+        time.sleep(float(source.split("SLEEP")[1].split()[0]))
+    if "FAIL" in source:
+        sys.exit("boom")
+    out_dir = os.path.join(media_dir, "videos", "scene", "480p15")
+    os.makedirs(out_dir, exist_ok=True)
+    with open(os.path.join(out_dir, output + ".mp4"), "w") as f:
+        f.write(args[0] + " " + scene + "\\n" + source)
+""")
+
+SOURCE = textwrap.dedent("""
+    from manim import *
+
+    class Intro(Scene):
+        pass
+
+    class Outro(MovingCameraScene):
+        pass
+""")
+
+
+@pytest.fixture
+def farm_factory(tmp_path, monkeypatch):
+    script = tmp_path / "fake_manim.py"
+    script.write_text(FAKE_MANIM)
+    log = tmp_path / "manim.log"
+    log.write_text("")
+    monkeypatch.setenv("FAKE_MANIM_LOG", str(log))
+
+    def make(**kwargs):
+        kwargs.setdefault("cache_dir", str(tmp_path / "cache"))
+        kwargs.setdefault("cache_max_bytes", 1024 * 1024)
+        return ManimRenderFarm(command=[sys.executable, str(script)], **kwargs)
+
+    make.invocations = lambda: log.read_text().split()
+    return make
+
+
+def test_scene_names_finds_every_scene_in_order():
+    assert scene_names(SOURCE) == ["Intro", "Outro"]
+
+
+def test_render_defaults_to_first_scene_and_caches(farm_factory):
+    farm = farm_factory()
+
+    async def main():
+        first = await farm.render(SOURCE, quality="low")
+        second = await farm.render(SOURCE, quality="low")
+        return first, second
+
+    first, second = asyncio.run(main())
+    assert first == second
+    assert first.endswith(render_cache_key(SOURCE, "Intro", "low"))
+    assert open(first).read().startswith("-ql")
+    assert farm_factory.invocations() == ["Intro"]
+    assert farm.stats()["rendered"] == 1
+
+
+def test_concurrent_identical_renders_share_one_process(farm_factory):
+    source = "class Slow(Scene):\n    pass\n# SLEEP 0.3\n"
+    farm = farm_factory(workers=2)
+
+    async def main():
+        return await asyncio.gather(*(farm.render(source) for _ in range(5)))
+
+    paths = asyncio.run(main())
+    assert len(set(paths)) == 1
+    assert farm_factory.invocations() == ["Slow"]
+    assert farm.stats()["deduplicated"] == 4
+
+
+def test_timeouts_kill_the_render(farm_factory):
+    farm = farm_factory(timeout=0.2)
+    with pytest.raises(RenderError, match="timed out"):
+        asyncio.run(farm.render("class Stuck(Scene):\n    pass\n# SLEEP 30\n"))
+    assert farm.stats()["failed"] == 1
+
+
+def test_failures_are_not_cached(farm_factory):
+    farm = farm_factory()
+    source = "class Broken(Scene):\n    pass\n# FAIL\n"
+
+    async def main():
+        for _ in range(2):
+            with pytest.raises(RenderError, match="boom"):
+                await farm.render(source)
+
+    asyncio.run(main())
+    assert farm_factory.invocations() == ["Broken", "Broken"]
+
+
+def test_queue_is_bounded(farm_factory):
+    farm = farm_factory(workers=1, max_queue=1)
+
+    async def main():
+        sources = [f"class S{i}(Scene):\n    pass\n# SLEEP 0.2\n" for i in range(3)]
+        running = [asyncio.ensure_future(farm.render(source)) for source in sources[:2]]
+        await asyncio.sleep(0)
+        with pytest.raises(QueueFullError):
+            await farm.render(sources[2])
+        await asyncio.gather(*running)
+
+    asyncio.run(main())
+
+
+def test_every_scene_renders_in_parallel_and_joins_in_order(farm_factory, monkeypatch):
+    import time
+    import manim_render
+
+    def concat(paths, output_path):
+        with open(output_path, "w") as out:
+            out.write("|".join(open(path).readline().split()[1] for path in paths))
+
+    monkeypatch.setattr(manim_render, "concat_videos", concat)
+    source = "".join(f"class Part{i}(Scene):\n    pass\n" for i in range(3)) + "# SLEEP 0.4\n"
+    farm = farm_factory(workers=3)
+
+    started = time.monotonic()
+    path = asyncio.run(farm.render_video(source, quality="preview"))
+    elapsed = time.monotonic() - started
+
+    assert open(path).read() == "Part0|Part1|Part2"
+    assert sorted(farm_factory.invocations()) == ["Part0", "Part1", "Part2"]
+    assert elapsed < 1.0
+
+    assert asyncio.run(farm.render_video(source, quality="preview")) == path
+    assert len(farm_factory.invocations()) == 3
+
+
+def test_render_source_renders_one_scene_or_all_of_them(farm_factory, monkeypatch):
+    import manim_render
+
+    def concat(paths, output_path):
+        with open(output_path, "w") as out:
+            out.write("|".join(open(path).readline().split()[1] for path in paths))
+
+    monkeypatch.setattr(manim_render, "concat_videos", concat)
+    farm = farm_factory()
+
+    one = asyncio.run(farm.render_source(SOURCE, "Outro", quality="preview"))
+    assert open(one).readline().split() == ["-ql", "Outro"]
+    every = asyncio.run(farm.render_source(SOURCE, quality="preview"))
+    assert open(every).read() == "Intro|Outro"
+
+
+def test_preview_returns_while_the_final_render_runs_as_a_job(farm_factory):
+    from jobs import JobManager
+
+    async def main():
+        manager = JobManager(workers=1, max_queue=4)
+        await manager.start()
+        farm = farm_factory()
+        result = await farm.render_with_final(SOURCE, manager.submit, scene="Intro")
+        events = [event async for event in manager.events(result["final_job_id"])]
+        await manager.stop()
+        return result, manager.get(result["final_job_id"]), events
+
+    result, job, events = asyncio.run(main())
+    assert result["quality"] == "preview"
+    assert open(result["video_path"]).readline().split() == ["-ql", "Intro"]
+    assert result["status_url"] == f"/jobs/{job.id}"
+    assert job.status == "succeeded"
+    assert open(job.result["video_path"]).readline().split() == ["-qk", "Intro"]
+    assert [event["event"] for event in events][-2:] == ["stage", "succeeded"]
+
+
+def test_preview_alone_queues_no_job(farm_factory):
+    def submit(kind, func):
+        raise AssertionError("nothing to queue")
+
+    farm = farm_factory()
+    result = asyncio.run(farm.render_with_final(SOURCE, submit, scene="Intro", quality="low", final_quality="low"))
+    assert "final_job_id" not in result
+    with pytest.raises(ValueError):
+        asyncio.run(farm.render_with_final(SOURCE, submit, final_quality="huge"))
+
+
+def test_memory_limit_is_applied_by_prlimit_not_in_the_server(monkeypatch):
+    import manim_render
+
+    monkeypatch.setattr(manim_render.shutil, "which", lambda name: "/usr/bin/" + name)
+    assert limited_command(["manim"], 512) == ["/usr/bin/prlimit", f"--as={512 * 1024 * 1024}", "--", "manim"]
+    assert limited_command(["manim"], 0) == ["manim"]
+
+    monkeypatch.setattr(manim_render.shutil, "which", lambda name: None)
+    assert limited_command(["manim"], 512) == ["manim"]
+
+
+def test_renders_run_under_the_memory_limit(farm_factory, tmp_path):
+    import shutil
+
+    if shutil.which("prlimit") is None:
+        pytest.skip("prlimit is not installed")
+    farm = farm_factory(memory_limit_mb=1)
+    with pytest.raises(RenderError):
+        asyncio.run(farm.render("class Big(Scene):\n    pass\n"))
+
+
+def test_scenes_survive_eviction_until_they_are_joined(farm_factory, monkeypatch):
+    import manim_render
+
+    def concat(paths, output_path):
+        with open(output_path, "w") as out:
+            out.write("|".join(open(path).readline().split()[1] for path in paths))
+
+    monkeypatch.setattr(manim_render, "concat_videos", concat)
+    source = "".join(f"class Part{i}(Scene):\n    pass\n# SLEEP 0.{i}\n" for i in range(3))
+    # Room for one entry, so every put tries to evict everything else.
+    farm = farm_factory(workers=3, cache_max_bytes=1)
+
+    path = asyncio.run(farm.render_video(source, quality="preview"))
+    assert open(path).read() == "Part0|Part1|Part2"
+    assert farm.cache.stats()["entries"] == 1
@@ -0,0 +1,145 @@
+import asyncio
+
+import pytest
+
+import executors
+from narration import fit_window, frame_digests, iter_windows, merge_narrations, narrate_in_windows
+
+
+def frames(count, step=2.0):
+    return [(i * step, f"frame{i}") for i in range(count)]
+
+
+def test_windows_overlap_and_cover_every_frame():
+    windows = list(iter_windows(iter(frames(10)), window_size=4, overlap=2))
+    assert [[t for t, _ in w.frames] for w in windows] == [
+        [0, 2, 4, 6], [4, 6, 8, 10], [8, 10, 12, 14], [12, 14, 16, 18],
+    ]
+    assert windows[0].owned_start == float("-inf")
+    assert [w.owned_start for w in windows[1:]] == [6, 10, 14]
+
+
+def test_short_videos_get_a_single_window():
+    windows = list(iter_windows(iter(frames(3)), window_size=30, overlap=4))
+    assert len(windows) == 1
+    assert len(windows[0].frames) == 3
+
+
+def test_merge_keeps_each_line_once_in_time_order():
+    windows = list(iter_windows(iter(frames(6)), window_size=4, overlap=2))
+    results = [
+        (1, windows[1].owned_start, [{"timestamp": "4.0", "dialogue": "dup"}, {"timestamp": 8, "dialogue": "c"}]),
+        (0, windows[0].owned_start, [{"timestamp": 0, "dialogue": "a"}, {"timestamp": 4, "dialogue": "b"}, {"timestamp": 6, "dialogue": "dup"}]),
+    ]
+    assert merge_narrations(results) == [
+        {"timestamp": 0.0, "dialogue": "a"},
+        {"timestamp": 4.0, "dialogue": "b"},
+        {"timestamp": 8.0, "dialogue": "c"},
+    ]
+
+
+def test_windows_run_concurrently_with_a_bound_and_failures_stay_local():
+    in_flight = 0
+    peak = 0
+    calls = {}
+
+    async def narrate(window):
+        nonlocal in_flight, peak
+        calls[window.index] = calls.get(window.index, 0) + 1
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.01)
+        in_flight -= 1
+        if window.index == 2:
+            raise RuntimeError("context length exceeded")
+        return [{"timestamp": t, "dialogue": f"line {t}"} for t, _ in window.frames]
+
+    try:
+        narration, failed, thinned = asyncio.run(narrate_in_windows(
+            iter(frames(20)), narrate, window_size=4, overlap=1, concurrency=2, retries=1,
+        ))
+    finally:
+        executors.shutdown_pools()
+
+    assert peak == 2
+    assert failed == [2]
+    assert thinned == []
+    assert calls[2] == 2
+    timestamps = [entry["timestamp"] for entry in narration]
+    assert timestamps == sorted(set(timestamps))
+    assert 0.0 in timestamps and 38.0 in timestamps
+
+
+def test_all_windows_failing_raises():
+    async def narrate(window):
+        raise RuntimeError("api down")
+
+    try:
+        with pytest.raises(RuntimeError, match="api down"):
+            asyncio.run(narrate_in_windows(iter(frames(3)), narrate, retries=0))
+    finally:
+        executors.shutdown_pools()
+
+
+def test_windows_over_the_byte_budget_are_thinned_not_cut():
+    window = next(iter_windows(iter([(i * 2.0, "x" * 100) for i in range(10)]), window_size=10))
+    thinned, dropped = fit_window(window, byte_budget=450)
+    assert dropped == 6
+    assert [t for t, _ in thinned.frames] == [0.0, 6.0, 12.0, 18.0]
+    assert fit_window(window, byte_budget=1000) == (window, 0)
+
+
+def test_every_window_is_narrated_however_long_the_video():
+    seen = []
+
+    async def narrate(window):
+        seen.append(len(window.frames))
+        return [{"timestamp": t, "dialogue": "line"} for t, _ in window.frames]
+
+    long_video = [(i * 2.0, "x" * 100) for i in range(200)]
+    try:
+        narration, failed, thinned = asyncio.run(narrate_in_windows(
+            iter(long_video), narrate, window_size=10, overlap=0, byte_budget=500,
+        ))
+    finally:
+        executors.shutdown_pools()
+
+    assert len(seen) == 20
+    assert all(count <= 5 for count in seen)
+    assert thinned == list(range(20))
+    assert narration[-1]["timestamp"] == 398.0
+
+
+def test_frame_digests_identify_frames_by_content_and_time():
+    digests = frame_digests([(0.0, "abc"), (2.0, "abc"), (4.0, "abd")])
+    assert [t for t, _ in digests] == [0.0, 2.0, 4.0]
+    assert digests[0][1] == digests[1][1] != digests[2][1]
+    assert len(digests[0][1]) == 64
+
+
+def test_finished_windows_release_their_frames():
+    import gc
+    import weakref
+
+    finished = []
+    leaked = []
+
+    async def narrate(window):
+        gc.collect()
+        leaked.extend(ref().index for ref in finished if ref() is not None)
+        finished.append(weakref.ref(window))
+        await asyncio.sleep(0)
+        if window.index == 1:
+            raise RuntimeError("rate limited")
+        return [{"timestamp": t, "dialogue": "line"} for t, _ in window.frames]
+
+    try:
+        narration, failed, _ = asyncio.run(narrate_in_windows(
+            iter(frames(40)), narrate, window_size=4, overlap=0, concurrency=1, retries=0, byte_budget=None,
+        ))
+    finally:
+        executors.shutdown_pools()
+
+    assert failed == [1]
+    assert len(finished) == 10
+    assert leaked == []
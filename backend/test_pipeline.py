@@ -0,0 +1,59 @@
+import asyncio
+import time
+
+import pytest
+
+from pipeline import Stage, run_stages
+
+
+def test_independent_stages_overlap():
+    async def source():
+        return 2
+
+    async def slow_double(source):
+        await asyncio.sleep(0.2)
+        return source * 2
+
+    async def slow_square(source):
+        await asyncio.sleep(0.2)
+        return source ** 2
+
+    started = time.perf_counter()
+    results, timings = asyncio.run(run_stages([
+        Stage("source", source),
+        Stage("double", slow_double, deps=("source",)),
+        Stage("square", slow_square, deps=("source",)),
+    ]))
+
+    assert time.perf_counter() - started < 0.35
+    assert results == {"source": 2, "double": 4, "square": 4}
+    assert set(timings) == {"source", "double", "square", "total"}
+    assert timings["double"] >= 0.2
+
+
+def test_failure_cancels_running_stages():
+    cancelled = []
+
+    async def boom():
+        raise RuntimeError("upstream failed")
+
+    async def slow():
+        try:
+            await asyncio.sleep(5)
+        except asyncio.CancelledError:
+            cancelled.append(True)
+            raise
+
+    with pytest.raises(RuntimeError, match="upstream failed"):
+        asyncio.run(run_stages([Stage("boom", boom), Stage("slow", slow)]))
+    assert cancelled == [True]
+
+
+def test_invalid_graphs_are_rejected():
+    async def noop(**kwargs):
+        return None
+
+    with pytest.raises(ValueError, match="unknown"):
+        asyncio.run(run_stages([Stage("a", noop, deps=("missing",))]))
+    with pytest.raises(ValueError, match="cycle"):
+        asyncio.run(run_stages([Stage("a", noop, deps=("b",)), Stage("b", noop, deps=("a",))]))
@@ -0,0 +1,124 @@
+import asyncio
+import time
+
+from result_memo import ResultMemo, generation_cacheable, generation_key
+
+
+def test_key_ignores_case_whitespace_and_file_order():
+    assert generation_key(["b", "a"], "  Explain   Fourier series ") == generation_key(["a", "b"], "explain fourier series")
+    assert generation_key(["a"], "explain") != generation_key(["a", "b"], "explain")
+
+
+def test_concurrent_identical_calls_run_once():
+    memo = ResultMemo()
+    calls = []
+
+    async def work():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return {"video_url": "v"}
+
+    async def main():
+        return await asyncio.gather(*(memo.run("k", work) for _ in range(4)))
+
+    results = asyncio.run(main())
+    assert len(calls) == 1
+    assert [status for _, status in results] == ["miss", "coalesced", "coalesced", "coalesced"]
+    assert all(result == {"video_url": "v"} for result, _ in results)
+
+
+def test_results_are_memoized_until_they_expire():
+    memo = ResultMemo(ttl=0.05)
+    calls = []
+
+    async def work():
+        calls.append(1)
+        return {"n": len(calls)}
+
+    async def main():
+        first = await memo.run("k", work)
+        second = await memo.run("k", work)
+        await asyncio.sleep(0.1)
+        third = await memo.run("k", work)
+        return first, second, third
+
+    first, second, third = asyncio.run(main())
+    assert (first, second) == (({"n": 1}, "miss"), ({"n": 1}, "hit"))
+    assert third == ({"n": 2}, "miss")
+
+
+def test_uncacheable_and_failed_results_are_not_kept():
+    memo = ResultMemo(cacheable=lambda result: result.get("ok"))
+
+    async def bad():
+        return {"ok": False}
+
+    async def boom():
+        raise RuntimeError("boom")
+
+    async def main():
+        await memo.run("k", bad)
+        assert (await memo.run("k", bad))[1] == "miss"
+        for _ in range(2):
+            try:
+                await memo.run("e", boom)
+            except RuntimeError:
+                pass
+        return memo.stats()
+
+    stats = asyncio.run(main())
+    assert (stats["misses"], stats["entries"], stats["in_flight"]) == (4, 0, 0)
+
+
+def test_a_cancelled_caller_does_not_cancel_the_shared_run():
+    memo = ResultMemo()
+
+    async def work():
+        await asyncio.sleep(0.05)
+        return {"done": True}
+
+    async def main():
+        leader = asyncio.ensure_future(memo.run("k", work))
+        await asyncio.sleep(0)
+        follower = asyncio.ensure_future(memo.run("k", work))
+        await asyncio.sleep(0)
+        leader.cancel()
+        return await follower
+
+    assert asyncio.run(main()) == ({"done": True}, "coalesced")
+
+
+def test_least_recently_used_results_are_dropped():
+    memo = ResultMemo(max_entries=1)
+
+    async def work():
+        return {"t": time.time()}
+
+    async def main():
+        await memo.run("a", work)
+        await memo.run("b", work)
+        return (await memo.run("a", work))[1]
+
+    assert asyncio.run(main()) == "miss"
+
+
+def test_only_complete_generations_are_cacheable():
+    complete = {"video_url": "https://x/v.mp4", "main_content_url": "https://x/m.json", "placeholder_video": False}
+    assert generation_cacheable(complete)
+    assert not generation_cacheable({**complete, "main_content_url": None})
+    assert not generation_cacheable({**complete, "placeholder_video": True})
+    assert not generation_cacheable(({"error": "boom"}, 500))
+
+    async def main():
+        memo = ResultMemo(cacheable=generation_cacheable)
+        calls = []
+
+        async def generate():
+            calls.append(1)
+            return {**complete, "main_content_url": None}
+
+        await memo.run("k", generate)
+        await memo.run("k", generate)
+        return calls
+
+    assert len(asyncio.run(main())) == 2
@@ -0,0 +1,36 @@
+import numpy as np
+from langchain_community.vectorstores import FAISS
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+from retrieval import rerank, search_with_vectors
+
+
+def test_search_returns_stored_vectors():
+    embeddings = DeterministicFakeEmbedding(size=16)
+    texts = ["alpha", "beta", "gamma", "delta"]
+    vectorstore = FAISS.from_texts(texts, embeddings)
+
+    docs, vectors = search_with_vectors(vectorstore, embeddings.embed_query("gamma"), k=10)
+
+    assert len(docs) == len(texts)
+    assert docs[0].page_content == "gamma"
+    for doc, vector in zip(docs, vectors):
+        np.testing.assert_allclose(vector, embeddings.embed_documents([doc.page_content])[0], rtol=1e-6)
+
+
+def test_rerank_matches_per_document_dot_products():
+    embeddings = DeterministicFakeEmbedding(size=16)
+    vectorstore = FAISS.from_texts(["a", "b", "c", "d", "e"], embeddings)
+    query = embeddings.embed_query("c")
+
+    docs, vectors = search_with_vectors(vectorstore, query, k=5)
+    expected = sorted(
+        docs,
+        key=lambda doc: np.dot(query, embeddings.embed_documents([doc.page_content])[0]),
+        reverse=True,
+    )
+    assert [doc.page_content for doc in rerank(query, docs, vectors)] == [doc.page_content for doc in expected]
+
+
+def test_empty_candidates():
+    assert rerank([1.0, 0.0], [], np.empty((0, 2), dtype="float32")) == []
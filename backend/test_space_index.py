@@ -0,0 +1,199 @@
+import asyncio
+import os
+
+import numpy as np
+import pytest
+from langchain_core.embeddings import Embeddings
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+from space_index import SpaceIndexStore
+
+
+class RecordingEmbeddings(Embeddings):
+    def __init__(self):
+        self.texts = []
+
+    def embed_documents(self, texts):
+        self.texts.extend(texts)
+        return [self._vector(text) for text in texts]
+
+    def embed_query(self, text):
+        return self._vector(text)
+
+    def _vector(self, text):
+        rng = np.random.default_rng(abs(hash(text)) % (2 ** 32))
+        return rng.standard_normal(8).astype("float32").tolist()
+
+
+def write_file(tmp_path, name, word):
+    path = tmp_path / name
+    path.write_text(" ".join(f"{word}{j}" for j in range(100)))
+    return str(path)
+
+
+def make_store(root, embeddings):
+    splitter = RecursiveCharacterTextSplitter(chunk_size=200, chunk_overlap=20)
+    return SpaceIndexStore(embeddings, splitter, "test-model", root=str(root))
+
+
+def stored_files(store, space_id):
+    return asyncio.run(store.use(space_id, lambda vs: sorted({doc.metadata["file_hash"] for doc in vs.docstore._dict.values()})))
+
+
+def test_adding_files_embeds_only_new_ones(tmp_path):
+    embeddings = RecordingEmbeddings()
+    store = make_store(tmp_path / "spaces", embeddings)
+    a = write_file(tmp_path, "a.txt", "alpha")
+    b = write_file(tmp_path, "b.txt", "beta")
+
+    first = asyncio.run(store.add_files("space1", [a], ["hash-a"]))
+    embedded = len(embeddings.texts)
+    second = asyncio.run(store.add_files("space1", [a, b], ["hash-a", "hash-b"]))
+
+    assert first == {"added": ["hash-a"], "skipped": []}
+    assert second == {"added": ["hash-b"], "skipped": ["hash-a"]}
+    assert all(text.startswith("beta") for text in embeddings.texts[embedded:])
+    assert stored_files(store, "space1") == ["hash-a", "hash-b"]
+    files = asyncio.run(store.files("space1"))
+    assert [(f["file_hash"], f["name"]) for f in files] == [("hash-a", "a.txt"), ("hash-b", "b.txt")]
+
+
+def test_removing_a_file_deletes_only_its_vectors(tmp_path):
+    store = make_store(tmp_path / "spaces", RecordingEmbeddings())
+    a = write_file(tmp_path, "a.txt", "alpha")
+    b = write_file(tmp_path, "b.txt", "beta")
+    asyncio.run(store.add_files("space1", [a, b], ["hash-a", "hash-b"]))
+    total = asyncio.run(store.use("space1", lambda vs: vs.index.ntotal))
+    chunks_a = asyncio.run(store.files("space1"))[0]["chunks"]
+
+    assert asyncio.run(store.remove_file("space1", "hash-a"))
+    assert not asyncio.run(store.remove_file("space1", "hash-a"))
+    assert asyncio.run(store.use("space1", lambda vs: vs.index.ntotal)) == total - chunks_a
+    assert stored_files(store, "space1") == ["hash-b"]
+
+    asyncio.run(store.remove_file("space1", "hash-b"))
+    assert asyncio.run(store.use("space1", lambda vs: vs.index.ntotal)) is None
+
+
+def test_spaces_persist_and_stay_separate(tmp_path):
+    embeddings = RecordingEmbeddings()
+    root = tmp_path / "spaces"
+    a = write_file(tmp_path, "a.txt", "alpha")
+    b = write_file(tmp_path, "b.txt", "beta")
+    store = make_store(root, embeddings)
+    asyncio.run(store.add_files("space1", [a], ["hash-a"]))
+    asyncio.run(store.add_files("space2", [b], ["hash-b"]))
+
+    reopened = make_store(root, embeddings)
+    assert asyncio.run(reopened.file_hashes("space1")) == ["hash-a"]
+    assert stored_files(reopened, "space2") == ["hash-b"]
+    query = embeddings.embed_query("alpha0 alpha1")
+    hits = asyncio.run(reopened.use("space1", lambda vs: vs.similarity_search_by_vector(query, k=2)))
+    assert all(doc.metadata["source"] == "a.txt" for doc in hits)
+    assert reopened.stats()["spaces"] == 2
+
+    asyncio.run(reopened.delete("space1"))
+    assert asyncio.run(make_store(root, embeddings).file_hashes("space1")) == []
+
+
+def test_rejects_bad_space_ids_and_other_embedding_models(tmp_path):
+    embeddings = RecordingEmbeddings()
+    root = tmp_path / "spaces"
+    store = make_store(root, embeddings)
+    with pytest.raises(ValueError):
+        asyncio.run(store.files("../escape"))
+
+    asyncio.run(store.add_files("space1", [write_file(tmp_path, "a.txt", "alpha")], ["hash-a"]))
+    other = SpaceIndexStore(embeddings, store.splitter, "other-model", root=str(root))
+    with pytest.raises(ValueError):
+        asyncio.run(other.files("space1"))
+
+
+def test_searches_are_not_blocked_while_files_are_embedded(tmp_path):
+    import threading
+    import time
+
+    class SlowEmbeddings(RecordingEmbeddings):
+        def __init__(self):
+            super().__init__()
+            self.slow = threading.Event()
+
+        def embed_documents(self, texts):
+            if self.slow.is_set():
+                time.sleep(0.5)
+            return super().embed_documents(texts)
+
+    embeddings = SlowEmbeddings()
+    store = make_store(tmp_path / "spaces", embeddings)
+    asyncio.run(store.add_files("space1", [write_file(tmp_path, "a.txt", "alpha")], ["hash-a"]))
+    embeddings.slow.set()
+
+    async def main():
+        adding = asyncio.ensure_future(store.add_files("space1", [write_file(tmp_path, "b.txt", "beta")], ["hash-b"]))
+        await asyncio.sleep(0.1)
+        started = time.monotonic()
+        count = await store.use("space1", lambda vs: vs.index.ntotal)
+        waited = time.monotonic() - started
+        await adding
+        return count, waited
+
+    count, waited = asyncio.run(main())
+    assert waited < 0.3
+    assert count == asyncio.run(store.files("space1"))[0]["chunks"]
+    assert store._locks == {}
+
+
+def test_readers_see_the_old_version_until_the_new_one_is_published(tmp_path):
+    import time
+
+    embeddings = RecordingEmbeddings()
+    splitter = RecursiveCharacterTextSplitter(chunk_size=200, chunk_overlap=20)
+    # Nothing stays loaded, so every read goes to disk.
+    store = SpaceIndexStore(embeddings, splitter, "test-model", root=str(tmp_path / "spaces"), max_loaded=0)
+    asyncio.run(store.add_files("space1", [write_file(tmp_path, "a.txt", "alpha")], ["hash-a"]))
+
+    write = store._write
+
+    def slow_write(space_id, space):
+        version = write(space_id, space)
+        time.sleep(0.3)
+        return version
+
+    store._write = slow_write
+
+    async def main():
+        adding = asyncio.ensure_future(store.add_files("space1", [write_file(tmp_path, "b.txt", "beta")], ["hash-b"]))
+        await asyncio.sleep(0.15)
+        during = await store.file_hashes("space1")
+        await adding
+        return during, await store.file_hashes("space1")
+
+    during, after = asyncio.run(main())
+    assert during == ["hash-a"]
+    assert after == ["hash-a", "hash-b"]
+    assert len([name for name in os.listdir(tmp_path / "spaces" / "space1") if name.startswith("v-")]) == 1
+
+
+def test_interrupted_saves_leave_the_last_version_and_are_cleaned_up(tmp_path, monkeypatch):
+    import space_index
+
+    embeddings = RecordingEmbeddings()
+    root = tmp_path / "spaces"
+    store = make_store(root, embeddings)
+    asyncio.run(store.add_files("space1", [write_file(tmp_path, "a.txt", "alpha")], ["hash-a"]))
+
+    def crash(src, dst):
+        raise OSError("killed")
+
+    monkeypatch.setattr(space_index.os, "replace", crash)
+    with pytest.raises(OSError):
+        asyncio.run(store.add_files("space1", [write_file(tmp_path, "b.txt", "beta")], ["hash-b"]))
+    monkeypatch.undo()
+    # The new version and its pointer were written but never published.
+    assert len(os.listdir(root / "space1")) == 4
+
+    reopened = make_store(root, embeddings)
+    names = sorted(os.listdir(root / "space1"))
+    assert names[0] == "CURRENT" and len(names) == 2 and names[1].startswith("v-")
+    assert asyncio.run(reopened.file_hashes("space1")) == ["hash-a"]
+    assert stored_files(reopened, "space1") == ["hash-a"]
@@ -0,0 +1,88 @@
+import asyncio
+
+import httpx
+
+import storage
+from storage import SupabaseStorage
+
+VIDEO = bytes(range(256)) * 4096  # 1 MiB
+
+
+def make_transport(received, fail_first_patch=False, max_accept=None):
+    state = {"patched": False, "offset": 0}
+
+    async def handler(request: httpx.Request):
+        if request.url.host == "cdn.example.com":
+            return httpx.Response(200, headers={"Content-Type": "video/mp4", "Content-Length": str(len(VIDEO))}, content=VIDEO)
+        if request.method == "POST" and request.url.path == "/storage/v1/object/videos/abc.mp4":
+            received["auth"] = request.headers["Authorization"]
+            received["body"] = await request.aread()
+            return httpx.Response(200, json={"Key": "videos/abc.mp4"})
+        if request.method == "POST" and request.url.path == "/storage/v1/upload/resumable":
+            received["metadata"] = request.headers["Upload-Metadata"]
+            return httpx.Response(201, headers={"Location": "https://project.supabase.co/storage/v1/upload/resumable/1"})
+        if request.method == "PATCH":
+            body = await request.aread()
+            if fail_first_patch and not state["patched"]:
+                state["patched"] = True
+                return httpx.Response(500, text="try again")
+            assert int(request.headers["Upload-Offset"]) == state["offset"]
+            body = body[:max_accept] if max_accept else body
+            received.setdefault("pieces", []).append(body)
+            state["offset"] += len(body)
+            return httpx.Response(204, headers={"Upload-Offset": str(state["offset"])})
+        if request.method == "HEAD":
+            return httpx.Response(200, headers={"Upload-Offset": str(state["offset"])})
+        return httpx.Response(404)
+
+    return httpx.MockTransport(handler)
+
+
+def transfer(received, **kwargs):
+    async def main():
+        transport = make_transport(received, kwargs.pop("fail_first_patch", False), kwargs.pop("max_accept", None))
+        async with httpx.AsyncClient(transport=transport) as http:
+            target = SupabaseStorage("https://project.supabase.co", "secret")
+            return await target.transfer_url(http, "https://cdn.example.com/video.mp4", "abc.mp4", **kwargs)
+
+    return asyncio.run(main())
+
+
+def test_transfer_streams_body_into_bucket():
+    received = {}
+    url = transfer(received)
+    assert url == "https://project.supabase.co/storage/v1/object/public/videos/abc.mp4"
+    assert received["body"] == VIDEO
+    assert received["auth"] == "Bearer secret"
+
+
+def test_resumable_transfer_retries_failed_piece(monkeypatch):
+    monkeypatch.setattr(storage, "STORAGE_RESUMABLE_CHUNK_BYTES", 300 * 1024)
+    received = {}
+    transfer(received, resumable=True, fail_first_patch=True)
+    assert b"".join(received["pieces"]) == VIDEO
+    assert [len(piece) for piece in received["pieces"]] == [300 * 1024] * 3 + [len(VIDEO) - 900 * 1024]
+
+
+def test_resumable_transfer_resends_rest_of_partially_accepted_piece(monkeypatch):
+    monkeypatch.setattr(storage, "STORAGE_RESUMABLE_CHUNK_BYTES", 300 * 1024)
+    received = {}
+    transfer(received, resumable=True, max_accept=200 * 1024)
+    assert b"".join(received["pieces"]) == VIDEO
+    assert [len(piece) for piece in received["pieces"]][:3] == [200 * 1024, 100 * 1024, 200 * 1024]
+
+
+def test_local_file_is_uploaded_in_pieces(tmp_path, monkeypatch):
+    monkeypatch.setattr(storage, "STORAGE_TRANSFER_CHUNK_BYTES", 64 * 1024)
+    path = tmp_path / "video.mp4"
+    path.write_bytes(VIDEO)
+    received = {}
+
+    async def main():
+        async with httpx.AsyncClient(transport=make_transport(received)) as http:
+            target = SupabaseStorage("https://project.supabase.co", "secret")
+            return await target.upload_file(http, "abc.mp4", str(path), content_type="video/mp4")
+
+    url = asyncio.run(main())
+    assert url == "https://project.supabase.co/storage/v1/object/public/videos/abc.mp4"
+    assert received["body"] == VIDEO
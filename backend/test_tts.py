@@ -0,0 +1,116 @@
+import asyncio
+
+import pytest
+from elevenlabs.core import ApiError
+
+import tts
+from tts import synthesize, synthesize_all
+from tts_cache import TTSCache, tts_cache_key
+
+
+class FakeTextToSpeech:
+    def __init__(self, failures=None, delays=None):
+        self.failures = dict(failures or {})
+        self.delays = delays or {}
+        self.calls = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    def convert(self, text, voice_id, model_id, output_format):
+        self.calls.append((text, output_format))
+        if self.failures.get(text):
+            self.failures[text] -= 1
+            raise ApiError(status_code=429, headers={"retry-after": "0"}, body="rate limited")
+        return self._stream(text)
+
+    async def _stream(self, text):
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(self.delays.get(text, 0.01))
+            yield text.encode()
+            yield b"!"
+        finally:
+            self.in_flight -= 1
+
+
+class FakeClient:
+    def __init__(self, **kwargs):
+        self.text_to_speech = FakeTextToSpeech(**kwargs)
+
+
+def test_results_keep_input_order():
+    client = FakeClient(delays={"a": 0.05, "b": 0.0, "c": 0.02})
+    audio = asyncio.run(synthesize_all(client, ["a", "b", "c"], concurrency=3))
+    assert audio == [b"a!", b"b!", b"c!"]
+    assert all(fmt == "pcm_24000" for _, fmt in client.text_to_speech.calls)
+
+
+def test_concurrency_is_bounded():
+    client = FakeClient()
+    asyncio.run(synthesize_all(client, [str(i) for i in range(10)], concurrency=3))
+    assert client.text_to_speech.max_in_flight == 3
+
+
+def test_rate_limits_are_retried():
+    client = FakeClient(failures={"a": 2})
+    assert asyncio.run(synthesize(client, "a", max_retries=3)) == b"a!"
+    assert len(client.text_to_speech.calls) == 3
+
+
+def test_gives_up_after_max_retries():
+    client = FakeClient(failures={"a": 5})
+    with pytest.raises(ApiError):
+        asyncio.run(synthesize(client, "a", max_retries=1))
+    assert len(client.text_to_speech.calls) == 2
+
+
+def test_client_errors_are_not_retried():
+    class Unauthorized(FakeTextToSpeech):
+        def convert(self, **kwargs):
+            self.calls.append(kwargs)
+            raise ApiError(status_code=401, body="bad key")
+
+    client = FakeClient()
+    client.text_to_speech = Unauthorized()
+    with pytest.raises(ApiError):
+        asyncio.run(synthesize(client, "a"))
+    assert len(client.text_to_speech.calls) == 1
+
+
+def test_backoff_without_retry_after(monkeypatch):
+    monkeypatch.setattr(tts, "TTS_RETRY_BASE_SECONDS", 1.0)
+    delay = tts._retry_delay(ApiError(status_code=503), attempt=2)
+    assert 2.0 <= delay <= 6.0
+
+
+def test_repeated_texts_are_synthesized_once():
+    client = FakeClient()
+    audio = asyncio.run(synthesize_all(client, ["a", "b", "a"]))
+    assert audio == [b"a!", b"b!", b"a!"]
+    assert sorted(text for text, _ in client.text_to_speech.calls) == ["a", "b"]
+
+
+def test_cached_audio_skips_the_api(tmp_path):
+    cache = TTSCache(str(tmp_path), max_bytes=1024 * 1024)
+    first = FakeClient()
+    asyncio.run(synthesize_all(first, ["a", "b"], cache=cache))
+
+    second = FakeClient()
+    audio = asyncio.run(synthesize_all(second, ["b", "c", "a"], cache=cache))
+    assert audio == [b"b!", b"c!", b"a!"]
+    assert [text for text, _ in second.text_to_speech.calls] == ["c"]
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["entries"]) == (2, 3, 3)
+
+
+def test_cache_key_covers_voice_model_and_format():
+    base = tts_cache_key("hello", "voice", "model", "pcm_24000")
+    assert base == tts_cache_key("hello", "voice", "model", "pcm_24000")
+    assert len({
+        base,
+        tts_cache_key("hello!", "voice", "model", "pcm_24000"),
+        tts_cache_key("hello", "other", "model", "pcm_24000"),
+        tts_cache_key("hello", "voice", "other", "pcm_24000"),
+        tts_cache_key("hello", "voice", "model", "mp3_44100_128"),
+    }) == 5
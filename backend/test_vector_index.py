@@ -0,0 +1,88 @@
+import faiss
+import numpy as np
+import pytest
+
+from retrieval import rerank, search_with_vectors
+from vector_index import build_index, compact_index, factory_string, index_config, recall_at_k, resolve_index_type, tune_index
+
+
+def clustered_vectors(count=4000, dim=32, seed=0):
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((40, dim)).astype("float32") * 4
+    return (centers[rng.integers(0, 40, count)] + rng.standard_normal((count, dim))).astype("float32")
+
+
+def test_auto_stays_flat_for_small_collections(monkeypatch):
+    import vector_index
+
+    monkeypatch.setattr(vector_index, "VECTOR_INDEX_AUTO_THRESHOLD", 1000)
+    assert resolve_index_type(999, "auto") == "flat"
+    assert resolve_index_type(1000, "auto") == vector_index.VECTOR_INDEX_LARGE_TYPE
+    assert resolve_index_type(10, "hnsw") == "hnsw"
+
+
+def test_factory_strings():
+    assert factory_string("ivfpq", 384, 100000).endswith(",PQ64")
+    assert factory_string("sq8", 32, 4000).endswith(",SQ8")
+    assert factory_string("IVF8,Flat", 32, 4000) == "IVF8,Flat"
+
+
+# Floors a little under what each type measures on this data. 4-bit PQ keeps
+# the test fast but is coarse; full 8-bit PQ is far better (~0.93).
+@pytest.mark.parametrize("index_type,min_recall", [("hnsw", 0.97), ("ivf", 0.97), ("sq8", 0.97), ("IVF16,PQ16x4", 0.45)])
+def test_compact_indexes_keep_ids_and_high_recall(index_type, min_recall):
+    vectors = clustered_vectors()
+    flat = faiss.IndexFlatL2(vectors.shape[1])
+    flat.add(vectors)
+
+    compact, report = compact_index(flat, index_type)
+    assert compact.ntotal == len(vectors)
+    assert report["type"] == index_type
+    assert min_recall <= report["recall"] <= 1.0
+    if index_type != "hnsw" and index_type != "ivf":
+        assert report["bytes"] < report["flat_bytes"]
+
+    # Hits can still be reconstructed for reranking.
+    _, ids = compact.search(vectors[:1], 5)
+    assert compact.reconstruct_batch(ids[0]).shape == (5, vectors.shape[1])
+
+
+def test_flat_is_left_alone():
+    flat = faiss.IndexFlatL2(8)
+    flat.add(np.zeros((3, 8), dtype="float32"))
+    index, report = compact_index(flat, "flat")
+    assert index is flat and report is None
+
+
+def test_exact_index_has_full_recall():
+    vectors = clustered_vectors(count=500)
+    assert recall_at_k(build_index(vectors, "flat"), vectors) == 1.0
+
+
+def test_retrieval_works_on_a_compact_index():
+    from langchain_community.docstore.in_memory import InMemoryDocstore
+    from langchain_community.vectorstores import FAISS
+    from langchain_core.documents import Document
+
+    vectors = clustered_vectors(count=2000)
+    index = build_index(vectors, "sq8")
+    docstore = InMemoryDocstore({str(i): Document(page_content=str(i)) for i in range(len(vectors))})
+    vectorstore = FAISS(None, index, docstore, {i: str(i) for i in range(len(vectors))})
+
+    docs, found = search_with_vectors(vectorstore, vectors[7], k=5)
+    assert "7" in [doc.page_content for doc in rerank(vectors[7], docs, found)]
+
+
+def test_search_settings_are_applied_on_load_not_baked_into_the_key(monkeypatch):
+    import vector_index
+
+    key = index_config()
+    monkeypatch.setattr(vector_index, "VECTOR_INDEX_NPROBE", 3)
+    monkeypatch.setattr(vector_index, "VECTOR_INDEX_HNSW_EF_SEARCH", 17)
+    assert index_config() == key
+
+    vectors = clustered_vectors(count=2000)
+    ivf = faiss.deserialize_index(faiss.serialize_index(build_index(vectors, "sq8")))
+    assert faiss.extract_index_ivf(tune_index(ivf)).nprobe == 3
+    hnsw = faiss.deserialize_index(faiss.serialize_index(build_index(vectors, "hnsw")))
+    assert tune_index(hnsw).hnsw.efSearch == 17
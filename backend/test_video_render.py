@@ -0,0 +1,48 @@
+import video_render
+from video_render import ffmpeg_command
+
+
+def test_speed_change_retimes_and_reencodes_video():
+    command = ffmpeg_command("in.mp4", "out.mp4", 2.0, 24000)
+    assert command[command.index("-filter:v") + 1] == "setpts=PTS/2.000000"
+    assert command[command.index("-c:v") + 1] == "libx264"
+    assert command[command.index("-preset") + 1] == video_render.FFMPEG_PRESET
+    assert command[command.index("-ar") + 1] == "24000"
+    assert command[-1] == "out.mp4"
+
+
+def test_unchanged_speed_copies_the_video_stream():
+    command = ffmpeg_command("in.mp4", "out.mp4", 1.004, 24000)
+    assert "-filter:v" not in command
+    assert command[command.index("-c:v") + 1] == "copy"
+    assert command[command.index("-c:a") + 1] == "aac"
+
+
+def test_narration_replaces_the_source_audio():
+    command = ffmpeg_command("in.mp4", "out.mp4", 0.5, 24000)
+    maps = [command[i + 1] for i, arg in enumerate(command) if arg == "-map"]
+    assert maps == ["0:v:0", "1:a:0"]
+    pipe = command.index("pipe:0")
+    assert command[pipe - 7:pipe] == ["-f", "s16le", "-ar", "24000", "-ac", "1", "-i"]
+
+
+def test_aligned_render_maps_the_concatenated_segments():
+    from alignment import build_time_map
+    from video_render import aligned_ffmpeg_command
+
+    segments = build_time_map([(2.0, 2.0, 6.0), (6.0, 8.0, 1.0)], video_duration=10.0)
+    command = aligned_ffmpeg_command("in.mp4", "out.mp4", segments, 24000)
+    maps = [command[i + 1] for i, arg in enumerate(command) if arg == "-map"]
+    assert maps == ["[v]", "3:a:0"]
+    assert command.count("in.mp4") == 3
+
+
+def test_time_map_at_normal_speed_keeps_stream_copy():
+    from video_render import render_command
+
+    command = render_command("in.mp4", "out.mp4", 10.0, 10.0, 24000, cues=[(0.0, 0.0, 10.0)])
+    assert command[command.index("-c:v") + 1] == "copy"
+    assert "-filter_complex" not in command
+
+    command = render_command("in.mp4", "out.mp4", 10.0, 12.0, 24000, cues=[(2.0, 2.0, 6.0), (6.0, 8.0, 1.0)])
+    assert "-filter_complex" in command
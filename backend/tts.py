@@ -0,0 +1,92 @@
+import asyncio
+import os
+import random
+from typing import List, Optional
+
+from elevenlabs.core import ApiError
+
+from executors import run_in_thread
+from tts_cache import TTSCache, tts_cache_key
+
+TTS_VOICE_ID = "JBFqnCBsd6RMkjVDRZzb"
+TTS_MODEL_ID = "eleven_multilingual_v2"
+# Raw 16-bit mono PCM, which is what the audio stitching expects.
+TTS_OUTPUT_FORMAT = "pcm_24000"
+TTS_SAMPLE_RATE = 24000
+
+TTS_CONCURRENCY = int(os.getenv("TTS_CONCURRENCY", "4"))
+TTS_MAX_RETRIES = int(os.getenv("TTS_MAX_RETRIES", "4"))
+TTS_RETRY_BASE_SECONDS = float(os.getenv("TTS_RETRY_BASE_SECONDS", "1.0"))
+
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+def _retry_delay(error: ApiError, attempt: int) -> float:
+    headers = {key.lower(): value for key, value in (getattr(error, "headers", None) or {}).items()}
+    try:
+        return max(0.0, float(headers["retry-after"]))
+    except (KeyError, ValueError):
+        return TTS_RETRY_BASE_SECONDS * (2 ** attempt) * (0.5 + random.random())
+
+
+async def synthesize(
+    client,
+    text: str,
+    voice_id: str = TTS_VOICE_ID,
+    model_id: str = TTS_MODEL_ID,
+    output_format: str = TTS_OUTPUT_FORMAT,
+    max_retries: int = TTS_MAX_RETRIES,
+) -> bytes:
+    """
+    Synthesize one line of dialogue. Rate limits and transient server errors
+    are retried with exponential backoff, honouring Retry-After when present.
+    """
+    for attempt in range(max_retries + 1):
+        try:
+            audio = client.text_to_speech.convert(
+                text=text,
+                voice_id=voice_id,
+                model_id=model_id,
+                output_format=output_format,
+            )
+            return b"".join([chunk async for chunk in audio])
+        except ApiError as e:
+            if e.status_code not in RETRYABLE_STATUS_CODES or attempt == max_retries:
+                raise
+            delay = _retry_delay(e, attempt)
+            print(f"Eleven Labs returned {e.status_code}; retrying in {delay:.1f}s")
+            await asyncio.sleep(delay)
+
+
+async def synthesize_all(
+    client,
+    texts: List[str],
+    concurrency: Optional[int] = None,
+    cache: Optional[TTSCache] = None,
+    voice_id: str = TTS_VOICE_ID,
+    model_id: str = TTS_MODEL_ID,
+    output_format: str = TTS_OUTPUT_FORMAT,
+    **options,
+) -> List[bytes]:
+    """
+    Synthesize every text with bounded concurrency. Results keep the input
+    order. Repeated texts are synthesized once, and with a `cache` only texts
+    it has not seen before reach the API.
+    """
+    semaphore = asyncio.Semaphore(max(1, concurrency or TTS_CONCURRENCY))
+
+    async def run(text: str) -> bytes:
+        key = tts_cache_key(text, voice_id, model_id, output_format)
+        if cache is not None:
+            audio = await run_in_thread(cache.load, key)
+            if audio is not None:
+                return audio
+        async with semaphore:
+            audio = await synthesize(client, text, voice_id, model_id, output_format, **options)
+        if cache is not None and audio:
+            await run_in_thread(cache.save, key, audio)
+        return audio
+
+    unique = list(dict.fromkeys(texts))
+    audio = dict(zip(unique, await asyncio.gather(*(run(text) for text in unique))))
+    return [audio[text] for text in texts]
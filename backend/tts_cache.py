@@ -0,0 +1,49 @@
+import hashlib
+import json
+import os
+from typing import Optional
+
+from disk_cache import DiskLRUCache
+
+TTS_CACHE_DIR = os.getenv("TTS_CACHE_DIR", "tts_cache")
+TTS_CACHE_MAX_MB = int(os.getenv("TTS_CACHE_MAX_MB", "512"))
+
+
+def tts_cache_key(text: str, voice_id: str, model_id: str, output_format: str) -> str:
+    """Content address for the audio of `text` spoken with these settings."""
+    payload = json.dumps({
+        "text": text,
+        "voice_id": voice_id,
+        "model_id": model_id,
+        "output_format": output_format,
+    }, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class TTSCache:
+    """On-disk store of synthesized audio keyed by `tts_cache_key`."""
+
+    def __init__(self, root: str = TTS_CACHE_DIR, max_bytes: int = TTS_CACHE_MAX_MB * 1024 * 1024):
+        self.store = DiskLRUCache(root, max_bytes)
+
+    def load(self, key: str) -> Optional[bytes]:
+        path = self.store.get(key)
+        if path is None:
+            return None
+        try:
+            with open(path, "rb") as f:
+                return f.read()
+        except OSError as e:
+            print(f"Discarding unreadable cached audio {key}: {e}")
+            self.store.reject(key)
+            return None
+
+    def save(self, key: str, audio: bytes):
+        def write(tmp_path: str):
+            with open(tmp_path, "wb") as f:
+                f.write(audio)
+
+        self.store.put(key, write)
+
+    def stats(self) -> dict:
+        return self.store.stats()
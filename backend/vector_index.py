@@ -0,0 +1,159 @@
+import math
+import os
+import time
+from typing import Optional, Tuple
+
+import faiss
+import numpy as np
+
+# "flat" keeps exact float32 search; "hnsw", "ivf", "ivfpq" and "sq8" (IVF
+# with int8 vectors) trade a little recall for memory and speed; any other
+# value is passed to faiss.index_factory as-is. "auto" stays flat below
+# VECTOR_INDEX_AUTO_THRESHOLD chunks and uses VECTOR_INDEX_LARGE_TYPE above it.
+VECTOR_INDEX_TYPE = os.getenv("VECTOR_INDEX_TYPE", "auto")
+VECTOR_INDEX_LARGE_TYPE = os.getenv("VECTOR_INDEX_LARGE_TYPE", "sq8")
+VECTOR_INDEX_AUTO_THRESHOLD = int(os.getenv("VECTOR_INDEX_AUTO_THRESHOLD", "20000"))
+VECTOR_INDEX_NPROBE = int(os.getenv("VECTOR_INDEX_NPROBE", "16"))
+VECTOR_INDEX_HNSW_M = int(os.getenv("VECTOR_INDEX_HNSW_M", "32"))
+VECTOR_INDEX_HNSW_EF_SEARCH = int(os.getenv("VECTOR_INDEX_HNSW_EF_SEARCH", "64"))
+VECTOR_INDEX_RECALL_QUERIES = int(os.getenv("VECTOR_INDEX_RECALL_QUERIES", "200"))
+VECTOR_INDEX_RECALL_K = int(os.getenv("VECTOR_INDEX_RECALL_K", "10"))
+# Recall queries are stored vectors moved by Gaussian noise of this many
+# per-dimension standard deviations of the collection, so, like a real
+# prompt, a query is not itself one of the stored vectors.
+VECTOR_INDEX_RECALL_NOISE = float(os.getenv("VECTOR_INDEX_RECALL_NOISE", "0.5"))
+# k-means wants roughly this many training points per centroid; training on
+# more than that costs time without improving the index.
+TRAINING_POINTS_PER_CENTROID = 39
+PQ_CENTROIDS = 256
+
+
+def resolve_index_type(count: int, index_type: str = VECTOR_INDEX_TYPE) -> str:
+    if index_type == "auto":
+        return "flat" if count < VECTOR_INDEX_AUTO_THRESHOLD else VECTOR_INDEX_LARGE_TYPE
+    return index_type
+
+
+def index_config() -> str:
+    """
+    The build-time settings that decide which index gets built, for cache
+    keys. Search-time settings are applied by `tune_index` instead, so
+    changing them does not force a rebuild.
+    """
+    return f"{VECTOR_INDEX_TYPE}:{VECTOR_INDEX_LARGE_TYPE}:{VECTOR_INDEX_AUTO_THRESHOLD}:{VECTOR_INDEX_HNSW_M}"
+
+
+def tune_index(index: faiss.Index) -> faiss.Index:
+    """Apply the search-time settings (nprobe, efSearch); call on every built or loaded index."""
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is not None:
+        ivf.nprobe = min(VECTOR_INDEX_NPROBE, ivf.nlist)
+    if isinstance(index, faiss.IndexHNSW):
+        index.hnsw.efSearch = VECTOR_INDEX_HNSW_EF_SEARCH
+    return index
+
+
+def _ivf_lists(count: int) -> int:
+    return max(1, min(int(4 * math.sqrt(count)), count // TRAINING_POINTS_PER_CENTROID))
+
+
+def _pq_subquantizers(dim: int) -> int:
+    # Largest sub-vector count that divides the dimension, at 2+ dims per sub-vector.
+    for m in (64, 48, 32, 24, 16, 12, 8, 4, 2, 1):
+        if m * 2 <= dim and dim % m == 0:
+            return m
+    return 1
+
+
+def factory_string(index_type: str, dim: int, count: int) -> str:
+    nlist = _ivf_lists(count)
+    if index_type == "flat":
+        return "Flat"
+    if index_type == "hnsw":
+        return f"HNSW{VECTOR_INDEX_HNSW_M}"
+    if index_type == "ivf":
+        return f"IVF{nlist},Flat"
+    if index_type == "ivfpq":
+        return f"IVF{nlist},PQ{_pq_subquantizers(dim)}"
+    if index_type == "sq8":
+        return f"IVF{nlist},SQ8"
+    return index_type
+
+
+def build_index(vectors: np.ndarray, index_type: str) -> faiss.Index:
+    """
+    Train (if the type needs it) and fill an L2 index of `index_type` with
+    `vectors`, keeping their order so ids still line up with the docstore.
+    IVF indexes get a direct map so hits can be reconstructed for reranking.
+    """
+    count, dim = vectors.shape
+    index = faiss.index_factory(dim, factory_string(index_type, dim, count), faiss.METRIC_L2)
+    if not index.is_trained:
+        sample_size = TRAINING_POINTS_PER_CENTROID * max(_ivf_lists(count), PQ_CENTROIDS)
+        if count > sample_size:
+            rng = np.random.default_rng(0)
+            index.train(vectors[np.sort(rng.choice(count, size=sample_size, replace=False))])
+        else:
+            index.train(vectors)
+    index.add(vectors)
+
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is not None:
+        ivf.make_direct_map()
+    return tune_index(index)
+
+
+def recall_at_k(
+    index: faiss.Index,
+    vectors: np.ndarray,
+    k: int = VECTOR_INDEX_RECALL_K,
+    queries: int = VECTOR_INDEX_RECALL_QUERIES,
+    noise: float = VECTOR_INDEX_RECALL_NOISE,
+) -> float:
+    """
+    Share of the exact top-k neighbours of perturbed sample vectors (see
+    VECTOR_INDEX_RECALL_NOISE) that `index` also returns.
+    """
+    count = len(vectors)
+    k = min(k, count)
+    if k == 0:
+        return 1.0
+    rng = np.random.default_rng(0)
+    sample = vectors[rng.choice(count, size=min(queries, count), replace=False)]
+    scale = noise * float(vectors.std(axis=0).mean())
+    sample = (sample + rng.standard_normal(sample.shape) * scale).astype(np.float32)
+    exact = faiss.IndexFlatL2(vectors.shape[1])
+    exact.add(vectors)
+    _, expected = exact.search(sample, k)
+    _, found = index.search(sample, k)
+    hits = sum(len(set(e) & set(f)) for e, f in zip(expected, found))
+    return hits / (len(sample) * k)
+
+
+def compact_index(index: faiss.Index, index_type: str = VECTOR_INDEX_TYPE) -> Tuple[faiss.Index, Optional[dict]]:
+    """
+    Rebuild a flat index as `index_type` (resolved by size for "auto").
+    Returns the index to use and a report with the recall@k measured
+    against the flat original, or None if the index was kept as it is.
+    """
+    count = index.ntotal
+    resolved = resolve_index_type(count, index_type)
+    if resolved == "flat" or count == 0:
+        return index, None
+
+    started = time.perf_counter()
+    vectors = index.reconstruct_n(0, count)
+    compact = build_index(vectors, resolved)
+    build_seconds = time.perf_counter() - started
+    report = {
+        "type": resolved,
+        "factory": factory_string(resolved, index.d, count),
+        "vectors": count,
+        "flat_bytes": count * index.d * 4,
+        "bytes": faiss.serialize_index(compact).nbytes,
+        "recall_k": min(VECTOR_INDEX_RECALL_K, count),
+        "recall": round(recall_at_k(compact, vectors), 4),
+        "build_seconds": round(build_seconds, 3),
+    }
+    print(f"Built {report['factory']} index: {report}")
+    return compact, report
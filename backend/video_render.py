@@ -0,0 +1,177 @@
+import os
+import subprocess
+import tempfile
+from typing import List, Optional
+
+import numpy as np
+
+from alignment import ALIGN_MIN_SEGMENT_SECONDS, Cue, build_time_map, segment_filter, segment_inputs
+
+# "ffmpeg" does the speed change and mux in a single ffmpeg filter graph;
+# "moviepy" is the original frame-by-frame path.
+RENDER_BACKEND = os.getenv("RENDER_BACKEND", "ffmpeg")
+FFMPEG_BINARY = os.getenv("FFMPEG_BINARY", "ffmpeg")
+FFPROBE_BINARY = os.getenv("FFPROBE_BINARY", "ffprobe")
+# 0 lets ffmpeg/x264 pick the thread count from the available cores.
+FFMPEG_THREADS = int(os.getenv("FFMPEG_THREADS", "0"))
+FFMPEG_PRESET = os.getenv("FFMPEG_PRESET", "veryfast")
+FFMPEG_CRF = int(os.getenv("FFMPEG_CRF", "23"))
+# Speed factors this close to 1 are not worth a re-encode; the video stream is copied.
+STREAM_COPY_TOLERANCE = float(os.getenv("STREAM_COPY_TOLERANCE", "0.01"))
+# "segments" retimes the video piecewise so each narration line lines up with
+# the frames it describes; "global" applies one speed factor to the whole video.
+ALIGNMENT_MODE = os.getenv("ALIGNMENT_MODE", "segments")
+
+
+def probe_duration(path: str) -> float:
+    result = subprocess.run(
+        [FFPROBE_BINARY, "-v", "error", "-show_entries", "format=duration", "-of", "default=noprint_wrappers=1:nokey=1", path],
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode != 0:
+        raise Exception(f"ffprobe failed for {path}: {result.stderr.strip()}")
+    return float(result.stdout.strip())
+
+
+def ffmpeg_command(video_path: str, output_path: str, speed_factor: float, sample_rate: int, channels: int = 1) -> List[str]:
+    """
+    ffmpeg arguments that retime `video_path` by `speed_factor` and mux it
+    with raw s16le PCM read from stdin. The source video's own audio is
+    dropped, so only the video stream needs retiming.
+    """
+    command = [
+        FFMPEG_BINARY, "-y", "-v", "error",
+        "-i", video_path,
+        "-f", "s16le", "-ar", str(sample_rate), "-ac", str(channels), "-i", "pipe:0",
+        "-map", "0:v:0", "-map", "1:a:0",
+    ]
+    if abs(speed_factor - 1.0) <= STREAM_COPY_TOLERANCE:
+        command += ["-c:v", "copy"]
+    else:
+        command += [
+            "-filter:v", f"setpts=PTS/{speed_factor:.6f}",
+            "-c:v", "libx264", "-preset", FFMPEG_PRESET, "-crf", str(FFMPEG_CRF), "-pix_fmt", "yuv420p",
+        ]
+    command += [
+        "-threads", str(FFMPEG_THREADS),
+        "-c:a", "aac",
+        "-movflags", "+faststart",
+        output_path,
+    ]
+    return command
+
+
+def aligned_ffmpeg_command(video_path: str, output_path: str, segments, sample_rate: int, channels: int = 1) -> List[str]:
+    """Like `ffmpeg_command`, but retimes every segment of the time map separately in one pass."""
+    return [
+        FFMPEG_BINARY, "-y", "-v", "error",
+        *segment_inputs(video_path, segments),
+        "-f", "s16le", "-ar", str(sample_rate), "-ac", str(channels), "-i", "pipe:0",
+        "-filter_complex", segment_filter(segments),
+        "-map", "[v]", "-map", f"{len(segments)}:a:0",
+        "-c:v", "libx264", "-preset", FFMPEG_PRESET, "-crf", str(FFMPEG_CRF), "-pix_fmt", "yuv420p",
+        "-threads", str(FFMPEG_THREADS),
+        "-c:a", "aac",
+        "-movflags", "+faststart",
+        output_path,
+    ]
+
+
+def _speed_factor(video_duration: float, audio_duration: float) -> float:
+    print(f"Original video duration: {video_duration:.2f}s")
+    print(f"Generated audio duration: {audio_duration:.2f}s")
+    if audio_duration <= 0:
+        print("Warning: Audio duration is zero. Using original video.")
+        return 1.0
+    speed_factor = video_duration / audio_duration
+    print(f"Calculated video speed factor: {speed_factor:.2f}")
+    return speed_factor
+
+
+def _uniform_speed(segments, video_duration: float) -> Optional[float]:
+    """The speed of a time map that is one segment over the whole video with no padding, else None."""
+    if len(segments) != 1:
+        return None
+    segment = segments[0]
+    if segment.source_start > ALIGN_MIN_SEGMENT_SECONDS or video_duration - segment.source_end > ALIGN_MIN_SEGMENT_SECONDS:
+        return None
+    if segment.pad > ALIGN_MIN_SEGMENT_SECONDS:
+        return None
+    return segment.speed
+
+
+def render_command(
+    video_path: str,
+    output_path: str,
+    video_duration: float,
+    audio_duration: float,
+    sample_rate: int,
+    channels: int = 1,
+    cues: Optional[List[Cue]] = None,
+) -> List[str]:
+    segments = build_time_map(cues, video_duration) if cues else []
+    speed_factor = _uniform_speed(segments, video_duration) if segments else None
+    if segments and speed_factor is None:
+        print(f"Aligning video to narration in {len(segments)} segments")
+        return aligned_ffmpeg_command(video_path, output_path, segments, sample_rate, channels)
+    # A time map that retimes the whole video uniformly is a plain speed
+    # change, which keeps the stream-copy path when that speed is ~1.
+    if speed_factor is None:
+        speed_factor = _speed_factor(video_duration, audio_duration)
+    return ffmpeg_command(video_path, output_path, speed_factor, sample_rate, channels)
+
+
+def _render_ffmpeg(video_path: str, pcm: np.ndarray, sample_rate: int, output_path: str, cues: Optional[List[Cue]] = None):
+    video_duration = probe_duration(video_path)
+    command = render_command(video_path, output_path, video_duration, len(pcm) / sample_rate, sample_rate, pcm.shape[1], cues)
+    print(f"Writing final video to {output_path}...")
+    result = subprocess.run(command, input=np.ascontiguousarray(pcm, dtype=np.int16).tobytes(), capture_output=True)
+    if result.returncode != 0:
+        raise Exception(f"ffmpeg failed with exit code {result.returncode}: {result.stderr.decode(errors='replace')[-2000:]}")
+
+
+def _render_moviepy(video_path: str, pcm: np.ndarray, sample_rate: int, output_path: str):
+    from moviepy.editor import VideoFileClip, vfx
+    from moviepy.audio.AudioClip import AudioArrayClip
+
+    print("Loading video clip for synchronization...")
+    video_clip = VideoFileClip(video_path)
+    audio_clip = AudioArrayClip(pcm.astype(np.float32) / 32768.0, fps=sample_rate)
+
+    speed_factor = _speed_factor(video_clip.duration, audio_clip.duration)
+    final_clip = video_clip.fx(vfx.speedx, speed_factor) if speed_factor != 1.0 else video_clip
+    final_clip = final_clip.set_audio(audio_clip)
+
+    # moviepy encodes the audio track to a side file before muxing; keep it in
+    # a private directory so concurrent renders cannot overwrite each other's.
+    print(f"Writing final video to {output_path}...")
+    with tempfile.TemporaryDirectory(prefix="lumina_render_") as temp_dir:
+        final_clip.write_videofile(
+            output_path,
+            codec="libx264",
+            audio_codec="aac",
+            temp_audiofile=os.path.join(temp_dir, "audio.m4a"),
+            remove_temp=True,
+        )
+
+    video_clip.close()
+    audio_clip.close()
+    final_clip.close()
+
+
+def render_final_video(video_path: str, pcm: np.ndarray, sample_rate: int, output_path: str, cues: Optional[List[Cue]] = None):
+    """
+    Speed the video up or down to match the narration and mux them together.
+
+    `pcm` is the int16 narration track, shaped (frames, channels). It goes
+    straight to the AAC encoder, so the audio is only encoded once. With
+    `cues` (see `alignment.Cue`) and the ffmpeg backend, the video is aligned
+    to the narration line by line instead of with one global speed factor.
+    """
+    if RENDER_BACKEND == "moviepy":
+        _render_moviepy(video_path, pcm, sample_rate, output_path)
+    elif RENDER_BACKEND == "ffmpeg":
+        _render_ffmpeg(video_path, pcm, sample_rate, output_path, cues if ALIGNMENT_MODE == "segments" else None)
+    else:
+        raise ValueError(f"Unknown render backend '{RENDER_BACKEND}', expected 'ffmpeg' or 'moviepy'")